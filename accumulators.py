@@ -0,0 +1,350 @@
+import numpy as np
+
+from regions import crop_to_regions
+
+
+class QuantileSketch:
+    """Mergeable quantile sketch with relative accuracy.
+
+    Values are counted in logarithmically spaced bins (as in DDSketch), so
+    every quantile estimate is within `relative_accuracy` of a true value
+    and the memory depends only on the dynamic range of the data, not on how
+    many values were added. Two sketches with the same settings can be
+    merged exactly. At most `max_bins` bins are kept for each sign; beyond
+    that the bins of the smallest magnitudes are collapsed together, which
+    only affects the accuracy of those values. Non-finite values are
+    ignored.
+    """
+    def __init__(self, relative_accuracy=0.01, min_value=1e-9, max_bins=2048):
+        """Initialize sketch
+
+        Parameters
+        ----------
+        relative_accuracy : float
+            relative error of the quantile estimates, between 0 and 1
+        min_value : float
+            values with a smaller magnitude are counted as zero
+        max_bins : int
+            maximum number of bins for positive and for negative values
+        """
+        if not 0 < relative_accuracy < 1:
+            raise ValueError("relative_accuracy should be between 0 and 1")
+        if max_bins < 1:
+            raise ValueError("max_bins should be positive")
+
+        self.relative_accuracy = relative_accuracy
+        self.min_value = min_value
+        self.max_bins = max_bins
+        self.gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self._log_gamma = np.log(self.gamma)
+        self.count = 0
+        self.zero_count = 0
+        self._positive = _BinStore(max_bins)
+        self._negative = _BinStore(max_bins)
+
+    def update(self, values):
+        """Add values to the sketch.
+
+        Parameters
+        ----------
+        values : ndarray
+            values to add, any shape
+        """
+        values = np.asarray(values, dtype=float).ravel()
+        values = values[np.isfinite(values)]
+
+        positive = values[values >= self.min_value]
+        negative = -values[values <= -self.min_value]
+        self._positive.add(self._index(positive))
+        self._negative.add(self._index(negative))
+        self.zero_count += values.size - positive.size - negative.size
+        self.count += values.size
+
+    def _index(self, values):
+        return np.ceil(np.log(values) / self._log_gamma).astype(np.int64)
+
+    def _value(self, index):
+        return 2 * self.gamma ** index / (self.gamma + 1)
+
+    def merge(self, other):
+        """Add the counts of another sketch to this one.
+
+        Parameters
+        ----------
+        other : QuantileSketch
+            sketch with the same settings
+        """
+        self._check_mergeable(other)
+
+        self._positive.merge(other._positive)
+        self._negative.merge(other._negative)
+        self.zero_count += other.zero_count
+        self.count += other.count
+
+    def _check_mergeable(self, other):
+        if (other.relative_accuracy != self.relative_accuracy
+                or other.min_value != self.min_value
+                or other.max_bins != self.max_bins):
+            raise ValueError("Cannot merge sketches with different settings")
+
+    def quantile(self, q):
+        """Estimate quantiles of the added values.
+
+        Parameters
+        ----------
+        q : float or ndarray
+            quantiles between 0 and 1
+
+        Returns
+        -------
+        values : float or ndarray
+            nan if the sketch is empty
+
+        """
+        q = np.asarray(q, dtype=float)
+        if np.any((q < 0) | (q > 1)):
+            raise ValueError("Quantiles should be between 0 and 1")
+        if self.count == 0:
+            return np.full(q.shape, np.nan)[()]
+
+        # bins in increasing order of value: negative bins from the largest
+        # magnitude down, the zero bin, then positive bins
+        neg_idx, neg_counts = self._negative.bins()
+        pos_idx, pos_counts = self._positive.bins()
+        values = np.concatenate([-self._value(neg_idx[::-1]), [0],
+            self._value(pos_idx)])
+        counts = np.concatenate([neg_counts[::-1], [self.zero_count],
+            pos_counts])
+
+        rank = q * (self.count - 1)
+        cumulative = np.cumsum(counts)
+        return values[np.searchsorted(cumulative, rank, side='right')]
+
+
+class _BinStore:
+    """Dense counts over a contiguous range of at most max_bins integer bin
+    indices. Indices below the range are counted in its lowest bin."""
+    def __init__(self, max_bins):
+        self.max_bins = max_bins
+        self.counts = np.zeros(0, dtype=np.int64)
+        self.offset = 0
+
+    def add(self, index, counts=None):
+        if index.size == 0:
+            return
+        counts = np.broadcast_to(1 if counts is None else counts, index.shape)
+
+        low = int(index.min())
+        high = int(index.max())
+        if self.counts.size > 0:
+            low = min(low, self.offset)
+            high = max(high, self.offset + self.counts.size - 1)
+        low = max(low, high - self.max_bins + 1)
+
+        if low != self.offset or high - low + 1 != self.counts.size:
+            # move the stored counts to the new range, collapsing the bins
+            # that fall below it
+            old_index = np.arange(self.counts.size) + self.offset
+            old_counts = self.counts
+            self.counts = np.zeros(high - low + 1, dtype=np.int64)
+            self.offset = low
+            np.add.at(self.counts, np.maximum(old_index, low) - low,
+                old_counts)
+
+        np.add.at(self.counts, np.maximum(index, low) - low, counts)
+
+    def merge(self, other):
+        idx, counts = other.bins()
+        self.add(idx, counts)
+
+    def bins(self):
+        nonzero = np.nonzero(self.counts)[0]
+        return nonzero + self.offset, self.counts[nonzero]
+
+
+class RegionAccumulator:
+    """Accumulate statistics of the values inside a region over a stream of
+    frames.
+
+    The region is rasterized once. Each update adds the running moments
+    (Welford/Chan), a fixed-bin histogram, the min/max and a quantile
+    sketch, so memory does not grow with the number of frames.
+    Accumulators built in different processes (they can be pickled) are
+    combined with merge().
+
+    Example
+    -------
+    >>> acc = RegionAccumulator(region, x_axis, z_axis,
+    ...     bin_edges=np.linspace(0, 60, 121))
+    >>> for frame in frames:
+    ...     acc.update(frame)
+    >>> acc.mean, acc.var(), acc.median()
+    """
+    def __init__(self, region, x_axis, z_axis, bin_edges=None,
+            relative_accuracy=0.01):
+        """Initialize accumulator
+
+        Parameters
+        ----------
+        region : Region
+            region whose values are accumulated
+        x_axis : ndarray
+            x- (lateral) coordinates
+        z_axis : ndarray
+            z- (axial) coordinates
+        bin_edges : ndarray or None
+            monotonically increasing histogram bin edges, None for no
+            histogram
+        relative_accuracy : float
+            relative accuracy of the quantile sketch
+
+        Non-finite values (nan, inf) are not accumulated; their number is
+        kept in the `nonfinite` attribute.
+        """
+        self.region = region
+        self.shape = (len(z_axis), len(x_axis))
+        self._z_slice, self._x_slice = crop_to_regions([region], x_axis,
+            z_axis)
+        self._mask = region.create_mask(np.asarray(x_axis)[self._x_slice],
+            np.asarray(z_axis)[self._z_slice])
+        self.n_pixels = int(self._mask.sum())
+
+        self.count = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.min = np.inf
+        self.max = -np.inf
+
+        if bin_edges is not None:
+            bin_edges = np.asarray(bin_edges, dtype=float)
+            self.hist = np.zeros(len(bin_edges) - 1, dtype=np.int64)
+        else:
+            self.hist = None
+        self.bin_edges = bin_edges
+        # values below the first and above the last edge
+        self.underflow = 0
+        self.overflow = 0
+        self.nonfinite = 0
+
+        self.sketch = QuantileSketch(relative_accuracy)
+
+    def update(self, frames):
+        """Add one frame or a stack of frames.
+
+        Parameters
+        ----------
+        frames : ndarray
+            2D image or stack of images with shape (n_frames, nz, nx)
+        """
+        frames = np.asarray(frames)
+        if frames.shape[-2:] != self.shape:
+            raise ValueError("frames do not match the grid of the region")
+
+        values = frames[..., self._z_slice, self._x_slice][..., self._mask]
+        self.update_values(values)
+
+    def update_values(self, values):
+        """Add values that were already extracted from the region.
+
+        Parameters
+        ----------
+        values : ndarray
+            values to add, any shape
+        """
+        values = np.asarray(values, dtype=float).ravel()
+
+        # drop nan and inf before any statistic is changed
+        finite = np.isfinite(values)
+        if not np.all(finite):
+            self.nonfinite += int(values.size - np.count_nonzero(finite))
+            values = values[finite]
+        if values.size == 0:
+            return
+
+        batch_mean = values.mean()
+        batch_m2 = np.sum((values - batch_mean) ** 2)
+        self._combine_moments(values.size, batch_mean, batch_m2)
+        self.min = min(self.min, values.min())
+        self.max = max(self.max, values.max())
+
+        if self.hist is not None:
+            self.hist += np.histogram(values, self.bin_edges)[0]
+            self.underflow += int(np.sum(values < self.bin_edges[0]))
+            self.overflow += int(np.sum(values > self.bin_edges[-1]))
+
+        self.sketch.update(values)
+
+    def _combine_moments(self, count, mean, m2):
+        total = self.count + count
+        delta = mean - self.mean
+        self.mean += delta * count / total
+        self.m2 += m2 + delta ** 2 * self.count * count / total
+        self.count = total
+
+    def merge(self, other):
+        """Add the statistics of another accumulator to this one.
+
+        Parameters
+        ----------
+        other : RegionAccumulator
+            accumulator with the same histogram bins and sketch accuracy
+        """
+        if (self.hist is None) != (other.hist is None) or (
+                self.hist is not None
+                and not np.array_equal(self.bin_edges, other.bin_edges)):
+            raise ValueError("Cannot merge accumulators with different bins")
+        self.sketch._check_mergeable(other.sketch)
+
+        if other.count > 0:
+            self._combine_moments(other.count, other.mean, other.m2)
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+        if self.hist is not None:
+            self.hist += other.hist
+        self.underflow += other.underflow
+        self.overflow += other.overflow
+        self.nonfinite += other.nonfinite
+        self.sketch.merge(other.sketch)
+
+    def var(self, ddof=0):
+        """Return the variance of the accumulated values."""
+        if self.count - ddof <= 0:
+            return np.nan
+        return self.m2 / (self.count - ddof)
+
+    def std(self, ddof=0):
+        """Return the standard deviation of the accumulated values."""
+        return np.sqrt(self.var(ddof))
+
+    def quantile(self, q):
+        """Estimate quantiles of the accumulated values.
+
+        Parameters
+        ----------
+        q : float or ndarray
+            quantiles between 0 and 1
+
+        Returns
+        -------
+        values : float or ndarray
+
+        """
+        return self.sketch.quantile(q)
+
+    def median(self):
+        """Estimate the median of the accumulated values."""
+        return self.quantile(0.5)
+
+    def histogram(self):
+        """Return the accumulated histogram.
+
+        Returns
+        -------
+        hist : ndarray
+            counts in each bin
+        bin_edges : ndarray
+
+        """
+        if self.hist is None:
+            raise ValueError("Accumulator was created without bin_edges")
+        return self.hist.copy(), self.bin_edges.copy()
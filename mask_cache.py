@@ -0,0 +1,289 @@
+import hashlib
+import os
+import tempfile
+import time
+
+import numpy as np
+
+import regions
+
+
+class MaskCache:
+    """Persistent on-disk cache of region masks.
+
+    Masks are keyed on the region parameters and the grid axes, stored
+    bit-packed along rows (one bit per pixel) as .npy files and loaded back
+    with memory mapping. Files are written to a temporary file and atomically
+    renamed into place, so several processes can share one cache directory.
+    When `max_bytes` is given, the least recently used masks are evicted once
+    the cache grows larger than that. Temporary files left behind by writers
+    that died count towards the limit and are removed once they are older
+    than `tmp_timeout` seconds.
+
+    Example
+    -------
+    >>> cache = MaskCache('/tmp/roi_masks', max_bytes=100e6)
+    >>> vals = cache.get_values_in_region(region, img, x_axis, z_axis)
+    """
+    suffix = '.npy'
+    tmp_suffix = '.tmp'
+
+    def __init__(self, directory, max_bytes=None, tmp_timeout=600):
+        """Initialize the cache
+
+        Parameters
+        ----------
+        directory : str
+            directory holding the cached masks, created if needed
+        max_bytes : int or None
+            maximum total size of the cache files, None for no limit
+        tmp_timeout : float
+            age in seconds after which a temporary file is considered left
+            behind by a failed writer
+        """
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.tmp_timeout = tmp_timeout
+        os.makedirs(directory, exist_ok=True)
+
+    def key(self, region, x_axis, z_axis):
+        """Return the cache key for a region on a grid.
+
+        Parameters
+        ----------
+        region : Region
+            region to rasterize
+        x_axis : ndarray
+            x- (lateral) coordinates
+        z_axis : ndarray
+            z- (axial) coordinates
+
+        Returns
+        -------
+        key : str
+            hex digest identifying the region parameters and the grid
+
+        """
+        h = hashlib.sha256()
+        _hash_region(h, region)
+        _hash_array(h, np.asarray(x_axis, dtype=float))
+        _hash_array(h, np.asarray(z_axis, dtype=float))
+        return h.hexdigest()
+
+    def _path(self, key):
+        return os.path.join(self.directory, key + self.suffix)
+
+    def get(self, region, x_axis, z_axis):
+        """Load a mask from the cache.
+
+        Returns
+        -------
+        mask : ndarray (boolean values) or None
+            None if the mask is not in the cache
+
+        """
+        path = self._path(self.key(region, x_axis, z_axis))
+        try:
+            packed = np.load(path, mmap_mode='r')
+        except (FileNotFoundError, ValueError, OSError):
+            # missing, or removed/truncated by another process
+            return None
+
+        if packed.shape[0] != len(z_axis):
+            return None
+        mask = np.unpackbits(packed, axis=1, count=len(x_axis)).astype(bool)
+        del packed
+
+        # mark as recently used for eviction
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+
+        return mask
+
+    def put(self, region, x_axis, z_axis, mask):
+        """Store a mask in the cache.
+
+        Parameters
+        ----------
+        region : Region
+            region the mask belongs to
+        x_axis : ndarray
+            x- (lateral) coordinates
+        z_axis : ndarray
+            z- (axial) coordinates
+        mask : ndarray (boolean values)
+            mask with shape (len(z_axis), len(x_axis))
+        """
+        mask = np.asarray(mask, dtype=bool)
+        if mask.shape != (len(z_axis), len(x_axis)):
+            raise ValueError("mask shape does not match the grid")
+
+        packed = np.packbits(mask, axis=1)
+        path = self._path(self.key(region, x_axis, z_axis))
+
+        # write to a temporary file and rename so readers never see a
+        # partially written mask
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory,
+            suffix=self.tmp_suffix)
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                np.save(f, packed)
+            os.replace(tmp_path, path)
+        except FileNotFoundError:
+            # the temporary file was removed by clear() in another process;
+            # the mask is simply not cached
+            return
+        except BaseException:
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+            raise
+
+        if self.max_bytes is not None:
+            self.evict()
+
+    def create_mask(self, region, x_axis, z_axis):
+        """Return the mask of a region, rasterizing it only on a cache miss.
+
+        Parameters
+        ----------
+        region : Region
+            region to rasterize
+        x_axis : ndarray
+            x- (lateral) coordinates
+        z_axis : ndarray
+            z- (axial) coordinates
+
+        Returns
+        -------
+        mask : ndarray (boolean values)
+
+        """
+        mask = self.get(region, x_axis, z_axis)
+        if mask is None:
+            mask = region.create_mask(x_axis, z_axis)
+            self.put(region, x_axis, z_axis, mask)
+        return mask
+
+    def get_values_in_region(self, region, img, x_axis, z_axis):
+        """Extract the values of an image inside a region using the cache.
+
+        Parameters
+        ----------
+        region : Region
+            region to extract
+        img : ndarray
+            Extract values from this 2D image that are inside the region
+        x_axis : ndarray
+            x- (lateral) coordinates
+        z_axis : ndarray
+            z- (axial) coordinates
+
+        Returns
+        -------
+        values : 1D array of values
+
+        """
+        mask = self.create_mask(region, x_axis, z_axis)
+        return img[mask]
+
+    def _entries(self, suffix=None):
+        """Return (mtime, size, path) of the cache files, or of the files
+        ending with another suffix."""
+        suffix = self.suffix if suffix is None else suffix
+        entries = []
+        for name in os.listdir(self.directory):
+            if not name.endswith(suffix):
+                continue
+            path = os.path.join(self.directory, name)
+            try:
+                st = os.stat(path)
+            except FileNotFoundError:
+                continue
+            entries.append((st.st_mtime, st.st_size, path))
+        return entries
+
+    def size(self):
+        """Return the total size of the cache files in bytes, including
+        temporary files."""
+        return sum(size for _, size, _ in
+            self._entries() + self._entries(self.tmp_suffix))
+
+    def evict(self):
+        """Remove temporary files left behind by failed writers, then least
+        recently used masks until the cache fits max_bytes."""
+        if self.max_bytes is None:
+            return
+
+        total = 0
+        stale = time.time() - self.tmp_timeout
+        for mtime, size, path in self._entries(self.tmp_suffix):
+            if mtime < stale:
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+            else:
+                # still being written by another process
+                total += size
+
+        entries = sorted(self._entries())
+        total += sum(size for _, size, _ in entries)
+        for _, size, path in entries:
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                # already evicted by another process
+                pass
+            total -= size
+
+    def clear(self):
+        """Remove all masks and temporary files from the cache."""
+        for _, _, path in self._entries() + self._entries(self.tmp_suffix):
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+
+
+def _hash_array(h, a):
+    a = np.ascontiguousarray(a)
+    h.update(str(a.dtype).encode())
+    h.update(str(a.shape).encode())
+    h.update(a.tobytes())
+
+
+def _hash_region(h, region):
+    """Feed the class and defining parameters of a region into a hash.
+
+    Derived attributes (area and private caches) are skipped and numbers are
+    hashed as floats, so equal regions get the same key however their
+    parameters were typed or loaded.
+    """
+    h.update(type(region).__name__.encode())
+    for name, value in sorted(vars(region).items()):
+        if name == 'area' or name.startswith('_'):
+            continue
+        h.update(name.encode())
+        if isinstance(value, regions.Region):
+            _hash_region(h, value)
+        elif isinstance(value, (list, tuple)) and value and all(
+                isinstance(v, regions.Region) for v in value):
+            h.update(str(len(value)).encode())
+            for sub_region in value:
+                _hash_region(h, sub_region)
+        elif isinstance(value, (np.ndarray, list, tuple)):
+            value = np.asarray(value)
+            if value.dtype.kind in 'iuf':
+                value = value.astype(float)
+            _hash_array(h, value)
+        elif isinstance(value, (int, float, np.number)) and not isinstance(
+                value, (bool, np.bool_)):
+            h.update(repr(float(value)).encode())
+        else:
+            h.update(repr(value).encode())
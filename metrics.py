@@ -0,0 +1,197 @@
+import numpy as np
+
+from regions import crop_to_regions
+
+
+def _crop_frames(region_list, frames, x_axis, z_axis):
+    """Return the cropped frames as (n_frames, n_pixels) and the region
+    masks on the crop as (n_regions, n_pixels)."""
+    frames = np.asarray(frames)
+    if frames.ndim == 2:
+        frames = frames[np.newaxis]
+    if frames.shape[1:] != (len(z_axis), len(x_axis)):
+        raise ValueError("frames should have shape (n_frames, nz, nx)")
+
+    z_slice, x_slice = crop_to_regions(region_list, x_axis, z_axis)
+    x_crop = np.asarray(x_axis)[x_slice]
+    z_crop = np.asarray(z_axis)[z_slice]
+
+    masks = np.asarray([region.create_mask(x_crop, z_crop).ravel()
+        for region in region_list], dtype=bool).reshape(len(region_list), -1)
+    crop = frames[:, z_slice, x_slice].reshape(frames.shape[0], -1)
+
+    return crop, masks
+
+
+def region_moments(region_list, frames, x_axis, z_axis):
+    """Compute the mean and variance of several regions in one pass.
+
+    The regions are rasterized once on the bounding box of their union and
+    the moments of all regions and frames come from a single matrix product
+    over that box.
+
+    Parameters
+    ----------
+    region_list : list of Region
+        regions to compute moments for
+    frames : ndarray
+        2D image or stack of images with shape (n_frames, nz, nx)
+    x_axis : ndarray
+        x- (lateral) coordinates
+    z_axis : ndarray
+        z- (axial) coordinates
+
+    Returns
+    -------
+    n : ndarray
+        number of pixels in each region, shape (n_regions,)
+    mean : ndarray
+        mean of each region, shape (n_frames, n_regions)
+    var : ndarray
+        population variance of each region, shape (n_frames, n_regions)
+
+    """
+    crop, masks = _crop_frames(region_list, frames, x_axis, z_axis)
+    return _moments(crop, masks)
+
+
+def _moments(crop, masks):
+    n = masks.sum(axis=1)
+    weights = masks.T.astype(float)
+
+    # shift by a per-frame reference to keep the variance accurate
+    if crop.shape[1] > 0:
+        ref = crop.mean(axis=1, keepdims=True)
+    else:
+        ref = np.zeros((crop.shape[0], 1))
+    shifted = crop - ref
+    s1 = shifted @ weights
+    s2 = (shifted ** 2) @ weights
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        mean_shifted = s1 / n
+        var = np.maximum(s2 / n - mean_shifted ** 2, 0)
+    mean = mean_shifted + ref
+
+    return n, mean, var
+
+
+def compute_contrast_metrics(pairs, frames, x_axis, z_axis, bins=256):
+    """Compute contrast, CNR and gCNR for pairs of target and background
+    regions in one pass over the bounding box of all regions.
+
+    Parameters
+    ----------
+    pairs : list of tuple
+        (target, background) region pairs
+    frames : ndarray
+        2D image or stack of images with shape (n_frames, nz, nx)
+    x_axis : ndarray
+        x- (lateral) coordinates
+    z_axis : ndarray
+        z- (axial) coordinates
+    bins : int or ndarray
+        number of histogram bins spanning the range of each frame inside the
+        target and background of a pair, or bin edges shared by all frames
+        and pairs. Values outside the edges are counted in the outermost
+        bins.
+
+    Returns
+    -------
+    metrics : list of dict
+        for each pair, a dictionary with keys 'contrast' (mean_t / mean_b),
+        'cnr' (|mean_t - mean_b| / sqrt(var_t + var_b)) and 'gcnr'
+        (1 - overlap of the normalized histograms). Each value is an array
+        with one entry per frame, or a scalar for a 2D frame. Empty when
+        there are no pairs.
+
+    """
+    single_frame = np.ndim(frames) == 2
+    if len(pairs) == 0:
+        return []
+
+    # rasterize every distinct region once
+    region_list = []
+    for pair in pairs:
+        for region in pair:
+            if not any(region is r for r in region_list):
+                region_list.append(region)
+    index = [tuple(next(i for i, r in enumerate(region_list) if r is region)
+        for region in pair) for pair in pairs]
+
+    crop, masks = _crop_frames(region_list, frames, x_axis, z_axis)
+    n, mean, var = _moments(crop, masks)
+    n_frames = crop.shape[0]
+
+    # bin edges given explicitly are shared, so the pixels are binned once
+    if np.ndim(bins) != 0:
+        shared_idx, n_bins = _bin_indices(crop, bins)
+
+    metrics = []
+    for t, b in index:
+        with np.errstate(invalid='ignore', divide='ignore'):
+            contrast = mean[:, t] / mean[:, b]
+            cnr = np.abs(mean[:, t] - mean[:, b]) / np.sqrt(var[:, t]
+                + var[:, b])
+
+        # with a number of bins, the range comes from the pixels of the
+        # pair only, so the result does not depend on the other pairs
+        in_pair = masks[t] | masks[b]
+        if np.ndim(bins) == 0:
+            bin_idx, n_bins = _bin_indices(crop[:, in_pair], bins)
+        else:
+            bin_idx = shared_idx[:, in_pair]
+        offsets = (np.arange(n_frames) * n_bins)[:, np.newaxis]
+
+        hists = []
+        for i in [t, b]:
+            counts = np.bincount((bin_idx[:, masks[i][in_pair]]
+                + offsets).ravel(), minlength=n_frames * n_bins)
+            with np.errstate(invalid='ignore', divide='ignore'):
+                hists.append(counts.reshape(n_frames, n_bins) / n[i])
+        gcnr = 1 - np.minimum(hists[0], hists[1]).sum(axis=1)
+
+        result = {'contrast': contrast, 'cnr': cnr, 'gcnr': gcnr}
+        if single_frame:
+            result = {key: value[0] for key, value in result.items()}
+        metrics.append(result)
+
+    return metrics
+
+
+def contrast_metrics(target, background, frames, x_axis, z_axis, bins=256):
+    """Compute contrast, CNR and gCNR between a target and a background
+    region. See compute_contrast_metrics() for details.
+
+    Returns
+    -------
+    metrics : dict
+        keys 'contrast', 'cnr' and 'gcnr'
+
+    """
+    return compute_contrast_metrics([(target, background)], frames, x_axis,
+        z_axis, bins)[0]
+
+
+def _bin_indices(values, bins):
+    """Return the histogram bin of every value and the number of bins.
+
+    With a number of bins, the bins span the range of each frame (row) of
+    values; otherwise bins are the edges shared by all frames.
+    """
+    if np.ndim(bins) == 0:
+        n_bins = int(bins)
+        if values.shape[1] > 0:
+            lower = values.min(axis=1, keepdims=True)
+            upper = values.max(axis=1, keepdims=True)
+        else:
+            lower = upper = np.zeros((values.shape[0], 1))
+        width = np.where(upper > lower, upper - lower, 1)
+        bin_idx = np.floor((values - lower) / width * n_bins)
+    else:
+        edges = np.asarray(bins)
+        n_bins = len(edges) - 1
+        bin_idx = np.searchsorted(edges, values, side='right') - 1
+
+    bin_idx = np.clip(bin_idx, 0, n_bins - 1).astype(np.intp)
+    return bin_idx, n_bins
@@ -0,0 +1,235 @@
+import numpy as np
+
+from regions import Profiler
+
+
+class RegionTiles:
+    """Tiles of a grid classified against a region.
+
+    Attributes
+    ----------
+    shape : tuple
+        (nz, nx) shape of the grid
+    inside : ndarray
+        Nx4 array of [z0, z1, x0, x1] pixel ranges of tiles fully inside
+        the region
+    boundary : list
+        (z0, z1, x0, x1, mask) for the tiles evaluated at pixel level
+    stats : dict
+        number of 'inside', 'outside' and 'boundary' tiles, number of
+        'tests' of tiles against the region and number of
+        'pixels_evaluated'
+    """
+    def __init__(self, shape, inside, boundary, stats):
+        self.shape = shape
+        self.inside = np.asarray(inside, dtype=np.intp).reshape(-1, 4)
+        self.boundary = boundary
+        self.stats = stats
+
+    def to_mask(self):
+        """Assemble the mask of the region.
+
+        Returns
+        -------
+        mask : ndarray (boolean values)
+
+        """
+        mask = np.zeros(self.shape, dtype=bool)
+        for z0, z1, x0, x1 in self.inside:
+            mask[z0:z1, x0:x1] = True
+        for z0, z1, x0, x1, tile_mask in self.boundary:
+            mask[z0:z1, x0:x1] = tile_mask
+        return mask
+
+    def count(self):
+        """Return the number of pixels inside the region."""
+        inside = self.inside
+        n_inside = np.sum((inside[:, 1] - inside[:, 0])
+            * (inside[:, 3] - inside[:, 2]))
+        return int(n_inside + sum(np.count_nonzero(tile[4])
+            for tile in self.boundary))
+
+
+def rasterize_tiles(region, x_axis, z_axis, tile_size=32, min_tile_size=8):
+    """Classify the tiles of a grid as inside, outside or on the boundary of
+    a region.
+
+    The grid is split into tiles of `tile_size` pixels which are tested
+    against the region with its box tests (intersects_box() and
+    contains_box()). Boundary tiles are split in four until they are at most
+    `min_tile_size` pixels wide, and only those are evaluated pixel by pixel,
+    so the cost grows with the length of the boundary rather than the area.
+
+    Parameters
+    ----------
+    region : Region
+        region to rasterize
+    x_axis : ndarray
+        x- (lateral) coordinates
+    z_axis : ndarray
+        z- (axial) coordinates
+    tile_size : int
+        side length of the coarsest tiles in pixels
+    min_tile_size : int
+        side length below which tiles are evaluated pixel by pixel
+
+    Returns
+    -------
+    tiles : RegionTiles
+
+    """
+    x_axis = np.asarray(x_axis)
+    z_axis = np.asarray(z_axis)
+    nz, nx = len(z_axis), len(x_axis)
+    if tile_size < 1 or min_tile_size < 1:
+        raise ValueError("Tile sizes should be positive")
+
+    # widen the tested boxes slightly so that pixels lying on the boundary
+    # always end up in boundary tiles
+    extent = max(np.max(np.abs(x_axis), initial=0),
+        np.max(np.abs(z_axis), initial=0), 1)
+    eps = 1e-9 * extent
+
+    inside = []
+    boundary = []
+    stats = {'inside': 0, 'outside': 0, 'boundary': 0, 'tests': 0,
+        'pixels_evaluated': 0}
+
+    t0 = Profiler.tic()
+    stack = [(z0, min(z0 + tile_size, nz), x0, min(x0 + tile_size, nx))
+        for z0 in range(0, nz, tile_size) for x0 in range(0, nx, tile_size)]
+    stack.reverse()
+    while stack:
+        z0, z1, x0, x1 = stack.pop()
+        x_tile = x_axis[x0:x1]
+        z_tile = z_axis[z0:z1]
+        box = (x_tile.min() - eps, x_tile.max() + eps,
+            z_tile.min() - eps, z_tile.max() + eps)
+
+        stats['tests'] += 1
+        if not region.intersects_box(*box):
+            stats['outside'] += 1
+            continue
+        if region.contains_box(*box):
+            stats['inside'] += 1
+            inside.append((z0, z1, x0, x1))
+            continue
+
+        if max(z1 - z0, x1 - x0) <= min_tile_size:
+            stats['boundary'] += 1
+            tile_mask = region.create_mask(x_tile, z_tile)
+            stats['pixels_evaluated'] += tile_mask.size
+            boundary.append((z0, z1, x0, x1, tile_mask))
+            continue
+
+        # split in four (or two, for tiles one pixel thick)
+        z_mid = (z0 + z1 + 1) // 2
+        x_mid = (x0 + x1 + 1) // 2
+        z_ranges = [(z0, z_mid), (z_mid, z1)] if z1 - z0 > 1 else [(z0, z1)]
+        x_ranges = [(x0, x_mid), (x_mid, x1)] if x1 - x0 > 1 else [(x0, x1)]
+        for za, zb in reversed(z_ranges):
+            for xa, xb in reversed(x_ranges):
+                stack.append((za, zb, xa, xb))
+    Profiler.toc(t0, region, 'tiles', nz * nx)
+
+    return RegionTiles((nz, nx), inside, boundary, stats)
+
+
+def rasterize(region, x_axis, z_axis, tile_size=32, min_tile_size=8):
+    """Create the mask of a region with coarse-to-fine rasterization.
+
+    Gives the same mask as region.create_mask(x_axis, z_axis). See
+    rasterize_tiles() for the parameters.
+
+    Returns
+    -------
+    mask : ndarray (boolean values)
+
+    """
+    return rasterize_tiles(region, x_axis, z_axis, tile_size,
+        min_tile_size).to_mask()
+
+
+class SummedAreaTable:
+    """Summed-area tables of an image (or stack of images) and its square.
+
+    The sum over any block of pixels takes four lookups, whatever its size,
+    so the interior tiles of a region are summed without visiting their
+    pixels.
+
+    Example
+    -------
+    >>> table = SummedAreaTable(img)
+    >>> tiles = rasterize_tiles(region, x_axis, z_axis)
+    >>> total, total_sq, n = table.region_sums(tiles)
+    """
+    def __init__(self, img):
+        """Initialize tables
+
+        Parameters
+        ----------
+        img : ndarray
+            2D image or stack of images with shape (..., nz, nx)
+        """
+        img = np.asarray(img, dtype=float)
+        self.img = img
+        self.shape = img.shape[-2:]
+        self.table = self._integrate(img)
+        self.table_sq = self._integrate(img ** 2)
+
+    @staticmethod
+    def _integrate(img):
+        pad = [(0, 0)] * (img.ndim - 2) + [(1, 0), (1, 0)]
+        return np.pad(img.cumsum(axis=-2).cumsum(axis=-1), pad)
+
+    @staticmethod
+    def _lookup(table, z0, z1, x0, x1):
+        return (table[..., z1, x1] - table[..., z0, x1]
+            - table[..., z1, x0] + table[..., z0, x0])
+
+    def block_sum(self, z0, z1, x0, x1):
+        """Return the sum over pixels [z0:z1, x0:x1].
+
+        Parameters
+        ----------
+        z0, z1, x0, x1 : int or ndarray
+            pixel ranges, arrays give one sum per block along the last axis
+
+        Returns
+        -------
+        total : float or ndarray
+
+        """
+        return self._lookup(self.table, z0, z1, x0, x1)
+
+    def region_sums(self, tiles):
+        """Return the sum, the sum of squares and the number of the pixels
+        inside a region.
+
+        Parameters
+        ----------
+        tiles : RegionTiles
+            tiles of the region on the grid of the image
+
+        Returns
+        -------
+        total : float or ndarray
+            sum of the pixel values, one per image of a stack
+        total_sq : float or ndarray
+            sum of the squared pixel values
+        n : int
+            number of pixels
+
+        """
+        if tiles.shape != self.shape:
+            raise ValueError("tiles do not match the shape of the image")
+
+        z0, z1, x0, x1 = tiles.inside.T
+        total = self._lookup(self.table, z0, z1, x0, x1).sum(axis=-1)
+        total_sq = self._lookup(self.table_sq, z0, z1, x0, x1).sum(axis=-1)
+        for bz0, bz1, bx0, bx1, tile_mask in tiles.boundary:
+            values = self.img[..., bz0:bz1, bx0:bx1][..., tile_mask]
+            total = total + values.sum(axis=-1)
+            total_sq = total_sq + (values ** 2).sum(axis=-1)
+
+        return total, total_sq, tiles.count()
@@ -1,5 +1,122 @@
+import functools
+import json
+import time
+
 import numpy as np
 import matplotlib.patches as mpatches
+import matplotlib.path as mpath
+
+
+# profiler that is currently recording, None when profiling is disabled
+_active_profiler = None
+
+
+class Profiler:
+    """Record call counts, wall time, bytes allocated and pixels evaluated for
+    each stage of mask creation, grouped by region type.
+
+    Use as a context manager; everything executed inside the `with` block is
+    recorded. When no profiler is active the instrumentation reduces to a
+    single global lookup per stage.
+
+    Example
+    -------
+    >>> with Profiler() as prof:
+    ...     vals = region.get_values_in_region(img, x_axis, z_axis)
+    >>> prof.as_dict()
+    """
+    def __init__(self):
+        self.stats = {}
+        self._previous = None
+
+    def __enter__(self):
+        global _active_profiler
+        self._previous = _active_profiler
+        _active_profiler = self
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        global _active_profiler
+        _active_profiler = self._previous
+        self._previous = None
+        return False
+
+    def record(self, region_type, stage, seconds, nbytes, pixels):
+        """Add one call of a stage to the statistics.
+
+        Parameters
+        ----------
+        region_type : str
+            name of the region class
+        stage : str
+            name of the stage, e.g. 'meshgrid' or 'indexing'
+        seconds : float
+            wall time spent in the stage
+        nbytes : int
+            bytes allocated for the arrays produced by the stage
+        pixels : int
+            number of grid points evaluated by the stage
+        """
+        stage_stats = self.stats.setdefault(region_type, {}).setdefault(
+            stage, {'calls': 0, 'time': 0.0, 'bytes': 0, 'pixels': 0} )
+        stage_stats['calls'] += 1
+        stage_stats['time'] += seconds
+        stage_stats['bytes'] += int(nbytes)
+        stage_stats['pixels'] += int(pixels)
+
+    @staticmethod
+    def tic():
+        """Start timing a stage. Returns None when profiling is disabled."""
+        if _active_profiler is None:
+            return None
+        return time.perf_counter()
+
+    @staticmethod
+    def toc(t0, region, stage, pixels, *arrays):
+        """Finish timing a stage started with tic() and record it in the
+        active profiler.
+
+        Parameters
+        ----------
+        t0 : float or None
+            value returned by tic()
+        region : Region
+            region evaluated by the stage
+        stage : str
+            name of the stage
+        pixels : int
+            number of grid points evaluated by the stage
+        arrays : ndarray
+            arrays produced by the stage, counted as allocated bytes
+        """
+        if t0 is None or _active_profiler is None:
+            return
+        seconds = time.perf_counter() - t0
+        nbytes = sum(np.asarray(a).nbytes for a in arrays)
+        _active_profiler.record(type(region).__name__, stage, seconds,
+            nbytes, pixels)
+
+    def reset(self):
+        """Discard all recorded statistics."""
+        self.stats = {}
+
+    def as_dict(self):
+        """Return the statistics as a nested dictionary.
+
+        Returns
+        -------
+        stats : dict
+            {region_type: {stage: {'calls', 'time', 'bytes', 'pixels'}}}
+
+        """
+        return {region_type: {stage: dict(values)
+                for stage, values in stages.items()}
+            for region_type, stages in self.stats.items()}
+
+    def to_json(self, **kwargs):
+        """Return the statistics as a JSON string. Keyword arguments are
+        passed to json.dumps."""
+        return json.dumps(self.as_dict(), **kwargs)
 
 
 class Region:
@@ -26,7 +143,7 @@ class Region:
         """
 
         # For this region, return all values for the image
-        mask = ( np.ones(z_axis.shape[0], x_axis.shape[0]) == 1 )
+        mask = ( np.ones((z_axis.shape[0], x_axis.shape[0])) == 1 )
 
         return mask
 
@@ -52,7 +169,135 @@ class Region:
 
         mask = self.create_mask(x_axis, z_axis)
 
-        return img[mask]
+        t0 = Profiler.tic()
+        values = img[mask]
+        Profiler.toc(t0, self, 'indexing', mask.size, values)
+
+        return values
+
+    def bounding_box(self):
+        """Return the bounding box of the region.
+
+        Returns
+        -------
+        bbox : tuple
+            (x_min, x_max, z_min, z_max)
+
+        """
+
+        # this region covers the whole image
+        return (-np.inf, np.inf, -np.inf, np.inf)
+
+    def contains_points(self, x, z):
+        """Test if points are inside the region.
+
+        Parameters
+        ----------
+        x : ndarray
+            x- (lateral) coordinates of the points
+        z : ndarray
+            z- (axial) coordinates of the points
+
+        Returns
+        -------
+        inside : ndarray (boolean values)
+            same shape as the broadcast of x and z
+
+        """
+
+        x, z = np.broadcast_arrays(x, z)
+        return np.ones(x.shape, dtype=bool)
+
+    def intersects_box(self, x_min, x_max, z_min, z_max):
+        """Test if the region intersects an axis-aligned box.
+
+        Parameters
+        ----------
+        x_min, x_max : float
+            lateral extent of the box
+        z_min, z_max : float
+            axial extent of the box
+
+        Returns
+        -------
+        intersects : bool
+
+        """
+
+        return x_min <= x_max and z_min <= z_max
+
+    def contains_box(self, x_min, x_max, z_min, z_max):
+        """Test if an axis-aligned box lies inside the region.
+
+        Parameters
+        ----------
+        x_min, x_max : float
+            lateral extent of the box
+        z_min, z_max : float
+            axial extent of the box
+
+        Returns
+        -------
+        contains : bool
+
+        """
+
+        return True
+
+    def grow(self, distance, x_axis=None, z_axis=None):
+        """Grow the region by a margin, or shrink it for a negative distance.
+
+        Parameters
+        ----------
+        distance : float
+            margin in the units of the region, negative values shrink it
+        x_axis : ndarray or None
+            x- (lateral) coordinates, not needed for this region
+        z_axis : ndarray or None
+            z- (axial) coordinates, not needed for this region
+
+        Returns
+        -------
+        region : Region
+
+        """
+
+        # the region covers the whole image
+        return Region()
+
+    def shrink(self, distance, x_axis=None, z_axis=None):
+        """Shrink the region by a margin. Same as grow(-distance)."""
+        return self.grow(-distance, x_axis, z_axis)
+
+    def _grow_on_grid(self, distance, x_axis, z_axis):
+        """Grow or shrink the region on a grid using span-based dilation or
+        erosion restricted to the neighborhood of the region."""
+        if x_axis is None or z_axis is None:
+            raise ValueError(f"Growing a {type(self).__name__} by this "
+                "distance needs x_axis and z_axis")
+
+        # the mask region needs increasing axes, whatever the grid order
+        x_axis = np.sort(np.asarray(x_axis))
+        z_axis = np.sort(np.asarray(z_axis))
+        margin = abs(distance)
+        x_min, x_max, z_min, z_max = self.bounding_box()
+        x_slice = _axis_slice(x_axis, x_min - margin, x_max + margin)
+        z_slice = _axis_slice(z_axis, z_min - margin, z_max + margin)
+        x_crop = x_axis[x_slice]
+        z_crop = z_axis[z_slice]
+
+        if len(x_crop) == 0 or len(z_crop) == 0:
+            mask = np.zeros((len(z_crop), len(x_crop)), dtype=bool)
+        else:
+            mask = self.create_mask(x_crop, z_crop)
+            radius_x = margin / _pixel_spacing(x_axis)
+            radius_z = margin / _pixel_spacing(z_axis)
+            if distance > 0:
+                mask = _dilate_spans(mask, radius_x, radius_z)
+            else:
+                mask = ~_dilate_spans(~mask, radius_x, radius_z)
+
+        return MaskRegion(mask, x_crop, z_crop, getattr(self, 'units', None))
 
     def create_mpl_patch(self):
         """Create a matplotlib patch for the region.
@@ -93,15 +338,132 @@ class Rectangle(Region):
 
         """
 
+        t0 = Profiler.tic()
         x_grid, z_grid = np.meshgrid( x_axis, z_axis )
+        Profiler.toc(t0, self, 'meshgrid', x_grid.size, x_grid, z_grid)
 
+        t0 = Profiler.tic()
         mask_x = np.abs( x_grid - self.xc ) <= (self.width / 2)
         mask_z = np.abs( z_grid - self.zc ) <= (self.height / 2)
 
         mask = mask_x * mask_z
+        Profiler.toc(t0, self, 'evaluate', mask.size, mask_x, mask_z,
+            mask)
 
         return mask
 
+    def bounding_box(self):
+        """Return the bounding box of the region.
+
+        Returns
+        -------
+        bbox : tuple
+            (x_min, x_max, z_min, z_max)
+
+        """
+
+        return (self.xc - self.width / 2, self.xc + self.width / 2,
+            self.zc - self.height / 2, self.zc + self.height / 2)
+
+    def contains_points(self, x, z):
+        """Test if points are inside the region.
+
+        Parameters
+        ----------
+        x : ndarray
+            x- (lateral) coordinates of the points
+        z : ndarray
+            z- (axial) coordinates of the points
+
+        Returns
+        -------
+        inside : ndarray (boolean values)
+            same shape as the broadcast of x and z
+
+        """
+
+        x = np.asarray(x)
+        z = np.asarray(z)
+        return ( (np.abs( x - self.xc ) <= (self.width / 2))
+            & (np.abs( z - self.zc ) <= (self.height / 2)) )
+
+    def intersects_box(self, x_min, x_max, z_min, z_max):
+        """Test if the region intersects an axis-aligned box.
+
+        Parameters
+        ----------
+        x_min, x_max : float
+            lateral extent of the box
+        z_min, z_max : float
+            axial extent of the box
+
+        Returns
+        -------
+        intersects : bool
+
+        """
+
+        return _boxes_overlap(self.bounding_box(),
+            (x_min, x_max, z_min, z_max))
+
+    def contains_box(self, x_min, x_max, z_min, z_max):
+        """Test if an axis-aligned box lies inside the region.
+
+        Parameters
+        ----------
+        x_min, x_max : float
+            lateral extent of the box
+        z_min, z_max : float
+            axial extent of the box
+
+        Returns
+        -------
+        contains : bool
+
+        """
+
+        return bool(np.all(self.contains_points(np.asarray([x_min, x_max]),
+            np.asarray([[z_min], [z_max]]))))
+
+    def grow(self, distance, x_axis=None, z_axis=None):
+        """Grow the rectangle by a margin, or shrink it for a negative
+        distance. Growing rounds the corners, so the result is the union of
+        two rectangles and four circles.
+
+        Parameters
+        ----------
+        distance : float
+            margin in the units of the region, negative values shrink it
+        x_axis : ndarray or None
+            x- (lateral) coordinates, not needed for this region
+        z_axis : ndarray or None
+            z- (axial) coordinates, not needed for this region
+
+        Returns
+        -------
+        region : Region
+
+        """
+
+        if distance >= 0:
+            if distance == 0:
+                return Rectangle(self.xc, self.zc, self.width, self.height,
+                    self.units)
+            corners = [Circle(self.xc + sx * self.width / 2,
+                self.zc + sz * self.height / 2, distance, self.units)
+                for sx in [-1, 1] for sz in [-1, 1]]
+            return RegionUnion([
+                Rectangle(self.xc, self.zc, self.width + 2 * distance,
+                    self.height, self.units),
+                Rectangle(self.xc, self.zc, self.width,
+                    self.height + 2 * distance, self.units)] + corners)
+
+        width = self.width + 2 * distance
+        height = self.height + 2 * distance
+        if width < 0 or height < 0:
+            raise ValueError("Shrinking by this distance removes the region")
+        return Rectangle(self.xc, self.zc, width, height, self.units)
+
     def create_mpl_patch(self):
         """Create a matplotlib patch for the region.
 
@@ -151,14 +513,127 @@ class Ellipse(Region):
 
         """
 
+        t0 = Profiler.tic()
         x_grid, z_grid = np.meshgrid( x_axis, z_axis )
+        Profiler.toc(t0, self, 'meshgrid', x_grid.size, x_grid, z_grid)
 
-        mask = np.sqrt( (x_grid - self.xc) ** 2 / self.radius_x ** 2
+        t0 = Profiler.tic()
+        dist = np.sqrt( (x_grid - self.xc) ** 2 / self.radius_x ** 2
             + (z_grid - self.zc) ** 2 / self.radius_z ** 2 )
-        mask = (mask <= 1)
+        mask = (dist <= 1)
+        Profiler.toc(t0, self, 'evaluate', mask.size, dist, mask)
 
         return mask
 
+    def bounding_box(self):
+        """Return the bounding box of the region.
+
+        Returns
+        -------
+        bbox : tuple
+            (x_min, x_max, z_min, z_max)
+
+        """
+
+        return (self.xc - self.radius_x, self.xc + self.radius_x,
+            self.zc - self.radius_z, self.zc + self.radius_z)
+
+    def contains_points(self, x, z):
+        """Test if points are inside the region.
+
+        Parameters
+        ----------
+        x : ndarray
+            x- (lateral) coordinates of the points
+        z : ndarray
+            z- (axial) coordinates of the points
+
+        Returns
+        -------
+        inside : ndarray (boolean values)
+            same shape as the broadcast of x and z
+
+        """
+
+        x = np.asarray(x)
+        z = np.asarray(z)
+        dist = np.sqrt( (x - self.xc) ** 2 / self.radius_x ** 2
+            + (z - self.zc) ** 2 / self.radius_z ** 2 )
+        return dist <= 1
+
+    def intersects_box(self, x_min, x_max, z_min, z_max):
+        """Test if the region intersects an axis-aligned box.
+
+        Parameters
+        ----------
+        x_min, x_max : float
+            lateral extent of the box
+        z_min, z_max : float
+            axial extent of the box
+
+        Returns
+        -------
+        intersects : bool
+
+        """
+
+        if not _boxes_overlap(self.bounding_box(),
+            (x_min, x_max, z_min, z_max)):
+            return False
+
+        # scale the axes so the ellipse becomes a unit circle; the box stays
+        # a box, and the closest point of the box to the center decides
+        dx = (np.clip(self.xc, x_min, x_max) - self.xc) / self.radius_x
+        dz = (np.clip(self.zc, z_min, z_max) - self.zc) / self.radius_z
+        return bool(np.sqrt(dx ** 2 + dz ** 2) <= 1)
+
+    def contains_box(self, x_min, x_max, z_min, z_max):
+        """Test if an axis-aligned box lies inside the region.
+
+        Parameters
+        ----------
+        x_min, x_max : float
+            lateral extent of the box
+        z_min, z_max : float
+            axial extent of the box
+
+        Returns
+        -------
+        contains : bool
+
+        """
+
+        # the ellipse is convex, so it contains the box if it contains the
+        # corners
+        return bool(np.all(self.contains_points(np.asarray([x_min, x_max]),
+            np.asarray([[z_min], [z_max]]))))
+
+    def grow(self, distance, x_axis=None, z_axis=None):
+        """Grow the ellipse by a margin, or shrink it for a negative distance.
+        The result is the ellipse with both radii changed by the margin, which
+        is exact for circles and approximate for other ellipses.
+
+        Parameters
+        ----------
+        distance : float
+            margin in the units of the region, negative values shrink it
+        x_axis : ndarray or None
+            x- (lateral) coordinates, not needed for this region
+        z_axis : ndarray or None
+            z- (axial) coordinates, not needed for this region
+
+        Returns
+        -------
+        region : Region
+
+        """
+
+        radius_x = self.radius_x + distance
+        radius_z = self.radius_z + distance
+        if radius_x <= 0 or radius_z <= 0:
+            raise ValueError("Shrinking by this distance removes the region")
+        return Ellipse(self.xc, self.zc, radius_x, radius_z, self.units)
+
     def create_mpl_patch(self):
         """Create a matplotlib patch for the region.
 
@@ -179,6 +654,29 @@ class Circle(Ellipse):
         super().__init__(xc, zc, radius, radius, units)
         self.radius = radius
 
+    def grow(self, distance, x_axis=None, z_axis=None):
+        """Grow the circle by a margin, or shrink it for a negative distance.
+
+        Parameters
+        ----------
+        distance : float
+            margin in the units of the region, negative values shrink it
+        x_axis : ndarray or None
+            x- (lateral) coordinates, not needed for this region
+        z_axis : ndarray or None
+            z- (axial) coordinates, not needed for this region
+
+        Returns
+        -------
+        region : Region
+
+        """
+
+        radius = self.radius + distance
+        if radius <= 0:
+            raise ValueError("Shrinking by this distance removes the region")
+        return Circle(self.xc, self.zc, radius, self.units)
+
 
 class Annulus(Region):
     def __init__(self, xc, zc ,radius_in, radius_out, units):
@@ -206,8 +704,11 @@ class Annulus(Region):
         mask : array_like
         """
 
+        t0 = Profiler.tic()
         x_grid, z_grid = np.meshgrid( x_axis, z_axis )
+        Profiler.toc(t0, self, 'meshgrid', x_grid.size, x_grid, z_grid)
 
+        t0 = Profiler.tic()
         mask_out = np.sqrt( (x_grid - self.xc) ** 2 + (z_grid - self.zc) ** 2 )
         mask_out = (mask_out <= self.radius_out)
 
@@ -215,9 +716,127 @@ class Annulus(Region):
         mask_in = (mask_in <= self.radius_in)
 
         mask = mask_out ^ mask_in
+        Profiler.toc(t0, self, 'evaluate', mask.size, mask_out, mask_in,
+            mask)
 
         return mask
 
+    def bounding_box(self):
+        """Return the bounding box of the region.
+
+        Returns
+        -------
+        bbox : tuple
+            (x_min, x_max, z_min, z_max)
+
+        """
+
+        return (self.xc - self.radius_out, self.xc + self.radius_out,
+            self.zc - self.radius_out, self.zc + self.radius_out)
+
+    def contains_points(self, x, z):
+        """Test if points are inside the region.
+
+        Parameters
+        ----------
+        x : ndarray
+            x- (lateral) coordinates of the points
+        z : ndarray
+            z- (axial) coordinates of the points
+
+        Returns
+        -------
+        inside : ndarray (boolean values)
+            same shape as the broadcast of x and z
+
+        """
+
+        x = np.asarray(x)
+        z = np.asarray(z)
+        dist = np.sqrt( (x - self.xc) ** 2 + (z - self.zc) ** 2 )
+        return (dist <= self.radius_out) ^ (dist <= self.radius_in)
+
+    def intersects_box(self, x_min, x_max, z_min, z_max):
+        """Test if the region intersects an axis-aligned box.
+
+        Parameters
+        ----------
+        x_min, x_max : float
+            lateral extent of the box
+        z_min, z_max : float
+            axial extent of the box
+
+        Returns
+        -------
+        intersects : bool
+
+        """
+
+        if not _boxes_overlap(self.bounding_box(),
+            (x_min, x_max, z_min, z_max)):
+            return False
+
+        # the closest point of the box must be inside the outer circle and
+        # the farthest point outside the inner circle
+        near_x = np.clip(self.xc, x_min, x_max) - self.xc
+        near_z = np.clip(self.zc, z_min, z_max) - self.zc
+        far_x = max(abs(x_min - self.xc), abs(x_max - self.xc))
+        far_z = max(abs(z_min - self.zc), abs(z_max - self.zc))
+        return bool( np.sqrt(near_x ** 2 + near_z ** 2) <= self.radius_out
+            and np.sqrt(far_x ** 2 + far_z ** 2) > self.radius_in )
+
+    def contains_box(self, x_min, x_max, z_min, z_max):
+        """Test if an axis-aligned box lies inside the region.
+
+        Parameters
+        ----------
+        x_min, x_max : float
+            lateral extent of the box
+        z_min, z_max : float
+            axial extent of the box
+
+        Returns
+        -------
+        contains : bool
+
+        """
+
+        # the farthest point of the box must be inside the outer circle and
+        # the closest point outside the inner circle
+        near_x = np.clip(self.xc, x_min, x_max) - self.xc
+        near_z = np.clip(self.zc, z_min, z_max) - self.zc
+        far_x = max(abs(x_min - self.xc), abs(x_max - self.xc))
+        far_z = max(abs(z_min - self.zc), abs(z_max - self.zc))
+        return bool( np.sqrt(far_x ** 2 + far_z ** 2) <= self.radius_out
+            and np.sqrt(near_x ** 2 + near_z ** 2) > self.radius_in )
+
+    def grow(self, distance, x_axis=None, z_axis=None):
+        """Grow the annulus by a margin, or shrink it for a negative distance.
+        Growing closes the hole once the margin exceeds the inner radius.
+
+        Parameters
+        ----------
+        distance : float
+            margin in the units of the region, negative values shrink it
+        x_axis : ndarray or None
+            x- (lateral) coordinates, not needed for this region
+        z_axis : ndarray or None
+            z- (axial) coordinates, not needed for this region
+
+        Returns
+        -------
+        region : Region
+
+        """
+
+        radius_in = self.radius_in - distance
+        radius_out = self.radius_out + distance
+        if radius_out <= max(radius_in, 0):
+            raise ValueError("Shrinking by this distance removes the region")
+        if radius_in <= 0:
+            return Circle(self.xc, self.zc, radius_out, self.units)
+        return Annulus(self.xc, self.zc, radius_in, radius_out, self.units)
+
     def create_mpl_patch(self):
         """Create a matplotlib patch for the region.
 
@@ -274,6 +893,7 @@ class Polygon(Region):
         self.vertices = vertices
         self.units = units
         self.area = area
+        self._bbox = (np.min(x), np.max(x), np.min(y), np.max(y))
 
     def create_mask(self, x_axis, z_axis):
         """
@@ -299,6 +919,7 @@ class Polygon(Region):
         patch =  mpatches.Polygon(xy=self.vertices)
 
         # create grid data
+        t0 = Profiler.tic()
         x_grid, z_grid = np.meshgrid( x_axis, z_axis )
 
         # reshape things
@@ -307,9 +928,13 @@ class Polygon(Region):
 
         # need an Nx2 array of xz-coordinates for grid points
         xy_grid = np.vstack([x_grid, z_grid]).transpose()
+        Profiler.toc(t0, self, 'meshgrid', x_grid.size, x_grid, z_grid,
+            xy_grid)
 
         # test if points inside the patch
+        t0 = Profiler.tic()
         mask = patch.contains_points(xy_grid)
+        Profiler.toc(t0, self, 'contains_points', mask.size, mask)
 
         # reshape outputs
         mask = np.reshape(mask, (len(z_axis), len(x_axis)))
@@ -318,33 +943,413 @@ class Polygon(Region):
 
         return mask
 
-    def create_mpl_patch(self):
-        """Create a matplotlib patch for the region.
+    def bounding_box(self):
+        """Return the bounding box of the region.
 
         Returns
         -------
-        patch : matplotlib patch
+        bbox : tuple
+            (x_min, x_max, z_min, z_max)
 
         """
-        patch =  mpatches.Polygon(xy=self.vertices,
-            edgecolor='red', facecolor="None" )
-        return patch    
 
+        return self._bbox
 
+    def contains_points(self, x, z):
+        """Test if points are inside the region.
 
-class RegionUnion(Region):
-    def __init__(self, region_list):
-        """
-        """
-        # make sure all regions in the list inherit from Region class
-        for region in region_list:
-            if not issubclass(type(region), Region):
-                raise ValueError('region_list includes a non-Region object.')
-        self.region_list = region_list
+        Parameters
+        ----------
+        x : ndarray
+            x- (lateral) coordinates of the points
+        z : ndarray
+            z- (axial) coordinates of the points
+
+        Returns
+        -------
+        inside : ndarray (boolean values)
+            same shape as the broadcast of x and z
 
-    def create_mask(self, x_axis, z_axis):
         """
-        Create a mask from a grid.
+
+        x, z = np.broadcast_arrays(x, z)
+        patch =  mpatches.Polygon(xy=self.vertices)
+        xy = np.column_stack([x.ravel(), z.ravel()])
+        if xy.shape[0] == 0:
+            return np.zeros(x.shape, dtype=bool)
+        return np.reshape(patch.contains_points(xy), x.shape)
+
+    def intersects_box(self, x_min, x_max, z_min, z_max):
+        """Test if the region intersects an axis-aligned box.
+
+        Parameters
+        ----------
+        x_min, x_max : float
+            lateral extent of the box
+        z_min, z_max : float
+            axial extent of the box
+
+        Returns
+        -------
+        intersects : bool
+
+        """
+
+        if not _boxes_overlap(self.bounding_box(),
+            (x_min, x_max, z_min, z_max)):
+            return False
+
+        # an edge of the polygon crosses the box, or the box is inside
+        if np.any(_segments_intersect_box(self.vertices,
+                np.roll(self.vertices, -1, axis=0),
+                x_min, x_max, z_min, z_max)):
+            return True
+        return bool(self.contains_points(x_min, z_min))
+
+    def contains_box(self, x_min, x_max, z_min, z_max):
+        """Test if an axis-aligned box lies inside the region.
+
+        Parameters
+        ----------
+        x_min, x_max : float
+            lateral extent of the box
+        z_min, z_max : float
+            axial extent of the box
+
+        Returns
+        -------
+        contains : bool
+
+        """
+
+        x_lo, x_hi, z_lo, z_hi = self.bounding_box()
+        if not (x_lo <= x_min and x_max <= x_hi
+                and z_lo <= z_min and z_max <= z_hi):
+            return False
+
+        # no edge of the polygon crosses the box and the box is inside
+        if np.any(_segments_intersect_box(self.vertices,
+                np.roll(self.vertices, -1, axis=0),
+                x_min, x_max, z_min, z_max)):
+            return False
+        return bool(self.contains_points(x_min, z_min))
+
+    def grow(self, distance, x_axis=None, z_axis=None):
+        """Grow the polygon by a margin, or shrink it for a negative distance.
+        The result contains the points within the margin of the polygon
+        (growing), or the points of the polygon at least the margin away from
+        its edges (shrinking), so narrow notches fill and narrow spikes
+        disappear.
+
+        Parameters
+        ----------
+        distance : float
+            margin in the units of the region, negative values shrink it
+        x_axis : ndarray or None
+            x- (lateral) coordinates, not needed for this region
+        z_axis : ndarray or None
+            z- (axial) coordinates, not needed for this region
+
+        Returns
+        -------
+        region : OffsetPolygon
+
+        """
+
+        if distance == 0:
+            return Polygon(self.vertices, self.units)
+        return OffsetPolygon(self, distance)
+
+    def create_mpl_patch(self):
+        """Create a matplotlib patch for the region.
+
+        Returns
+        -------
+        patch : matplotlib patch
+
+        """
+        patch =  mpatches.Polygon(xy=self.vertices,
+            edgecolor='red', facecolor="None" )
+        return patch    
+
+
+
+class OffsetPolygon(Region):
+    def __init__(self, polygon, distance):
+        """Initialize a polygon grown or shrunk by a margin
+
+        Parameters
+        ----------
+        polygon : Polygon
+            polygon to grow or shrink
+        distance : float
+            margin in the units of the polygon, negative values shrink it
+        """
+
+        super().__init__()
+
+        if not isinstance(polygon, Polygon):
+            raise ValueError("polygon should be a Polygon object")
+
+        self.polygon = polygon
+        self.distance = distance
+        self.units = polygon.units
+        self._start = np.asarray(polygon.vertices, dtype=float)
+        self._end = np.roll(self._start, -1, axis=0)
+
+    @functools.cached_property
+    def area(self):
+        """Area of the region, estimated on a 256 x 256 grid on the first
+        access."""
+        grid = self._outline_grid()
+        if grid is None:
+            return 0.0
+        x_axis, z_axis = grid
+        return (np.count_nonzero(self.create_mask(x_axis, z_axis))
+            * _pixel_spacing(x_axis) * _pixel_spacing(z_axis))
+
+    def _outline_grid(self, n=256):
+        """Return an n x n grid over the bounding box, or None when the
+        region is empty."""
+        x_min, x_max, z_min, z_max = self.bounding_box()
+        if x_min > x_max or z_min > z_max:
+            return None
+        return np.linspace(x_min, x_max, n), np.linspace(z_min, z_max, n)
+
+    def _near_edges(self, x, z):
+        """Test which points are within the margin of an edge (within or at
+        the margin when growing, strictly within when shrinking)."""
+        radius = abs(self.distance)
+        near = np.zeros(x.shape, dtype=bool)
+
+        # keep the number of point-edge pairs per chunk bounded
+        chunk = max(1, 2 ** 20 // len(self._start))
+        x_flat = x.ravel()
+        z_flat = z.ravel()
+        near_flat = near.ravel()
+        for i in range(0, x_flat.size, chunk):
+            dist = _point_segment_distance(x_flat[i:i + chunk, np.newaxis],
+                z_flat[i:i + chunk, np.newaxis], self._start, self._end)
+            dist = np.min(dist, axis=1)
+            near_flat[i:i + chunk] = (dist <= radius if self.distance > 0
+                else dist < radius)
+
+        return near
+
+    def create_mask(self, x_axis, z_axis):
+        """
+        Create a mask from a grid.
+
+        Parameters
+        ----------
+        x_axis : ndarray
+            x- (lateral) coordinates
+        z_axis : ndarray
+            z- (axial) coordinates
+        
+        Returns
+        -------
+        mask : ndarray (boolean values)
+
+        """
+
+        x_axis = np.asarray(x_axis)
+        z_axis = np.asarray(z_axis)
+        mask = self.polygon.create_mask(x_axis, z_axis)
+        radius = abs(self.distance)
+
+        # only the pixels near each edge need their distance to it
+        t0 = Profiler.tic()
+        near = np.zeros(mask.shape, dtype=bool)
+        for start, end in zip(self._start, self._end):
+            cols = np.nonzero(
+                (x_axis >= min(start[0], end[0]) - radius)
+                & (x_axis <= max(start[0], end[0]) + radius))[0]
+            rows = np.nonzero(
+                (z_axis >= min(start[1], end[1]) - radius)
+                & (z_axis <= max(start[1], end[1]) + radius))[0]
+            if cols.size == 0 or rows.size == 0:
+                continue
+            block = np.ix_(rows, cols)
+            dist = _point_segment_distance(x_axis[cols][np.newaxis, :],
+                z_axis[rows][:, np.newaxis], start, end)
+            near[block] |= (dist <= radius if self.distance > 0
+                else dist < radius)
+        Profiler.toc(t0, self, 'edge_distance', mask.size, near)
+
+        if self.distance > 0:
+            return mask | near
+        return mask & ~near
+
+    def bounding_box(self):
+        """Return the bounding box of the region.
+
+        Returns
+        -------
+        bbox : tuple
+            (x_min, x_max, z_min, z_max)
+
+        """
+
+        x_min, x_max, z_min, z_max = self.polygon.bounding_box()
+        d = self.distance
+        return (x_min - d, x_max + d, z_min - d, z_max + d)
+
+    def contains_points(self, x, z):
+        """Test if points are inside the region.
+
+        Parameters
+        ----------
+        x : ndarray
+            x- (lateral) coordinates of the points
+        z : ndarray
+            z- (axial) coordinates of the points
+
+        Returns
+        -------
+        inside : ndarray (boolean values)
+            same shape as the broadcast of x and z
+
+        """
+
+        x, z = np.broadcast_arrays(np.asarray(x, dtype=float),
+            np.asarray(z, dtype=float))
+        inside = self.polygon.contains_points(x, z)
+        near = self._near_edges(x, z)
+        if self.distance > 0:
+            return inside | near
+        return inside & ~near
+
+    def intersects_box(self, x_min, x_max, z_min, z_max):
+        """Test if the region intersects an axis-aligned box.
+
+        Exact when growing. When shrinking, True may also be returned for
+        boxes that only come close to the region.
+
+        Parameters
+        ----------
+        x_min, x_max : float
+            lateral extent of the box
+        z_min, z_max : float
+            axial extent of the box
+
+        Returns
+        -------
+        intersects : bool
+
+        """
+
+        if not _boxes_overlap(self.bounding_box(),
+            (x_min, x_max, z_min, z_max)):
+            return False
+        if self.polygon.intersects_box(x_min, x_max, z_min, z_max):
+            return True
+        if self.distance < 0:
+            return False
+        return bool(self._box_edge_distance(x_min, x_max, z_min, z_max)
+            <= self.distance)
+
+    def contains_box(self, x_min, x_max, z_min, z_max):
+        """Test if an axis-aligned box lies inside the region.
+
+        Exact when shrinking. When growing, False may also be returned for
+        boxes that are inside.
+
+        Parameters
+        ----------
+        x_min, x_max : float
+            lateral extent of the box
+        z_min, z_max : float
+            axial extent of the box
+
+        Returns
+        -------
+        contains : bool
+
+        """
+
+        if self.distance < 0:
+            return bool(self.polygon.contains_box(x_min, x_max, z_min, z_max)
+                and self._box_edge_distance(x_min, x_max, z_min, z_max)
+                >= -self.distance)
+
+        if self.polygon.contains_box(x_min, x_max, z_min, z_max):
+            return True
+        # every point of the box is within the margin of its center
+        xc = (x_min + x_max) / 2
+        zc = (z_min + z_max) / 2
+        half_diagonal = np.sqrt((x_max - x_min) ** 2
+            + (z_max - z_min) ** 2) / 2
+        if self.polygon.contains_points(xc, zc):
+            return bool(half_diagonal <= self.distance)
+        dist = np.min(_point_segment_distance(xc, zc, self._start,
+            self._end))
+        return bool(dist + half_diagonal <= self.distance)
+
+    def _box_edge_distance(self, x_min, x_max, z_min, z_max):
+        """Return the smallest distance between a box and the edges."""
+        return np.min(_box_segment_distance(self._start, self._end,
+            x_min, x_max, z_min, z_max))
+
+    def grow(self, distance, x_axis=None, z_axis=None):
+        """Grow the region by a margin, or shrink it for a negative distance.
+        Margins of the same sign add up exactly; otherwise the result is
+        computed on a grid with span-based dilation or erosion.
+
+        Parameters
+        ----------
+        distance : float
+            margin in the units of the region, negative values shrink it
+        x_axis : ndarray or None
+            x- (lateral) coordinates, needed when the margin is computed
+            on a grid
+        z_axis : ndarray or None
+            z- (axial) coordinates, needed when the margin is computed
+            on a grid
+
+        Returns
+        -------
+        region : Region
+
+        """
+
+        if distance == 0:
+            return OffsetPolygon(self.polygon, self.distance)
+        if (distance > 0) == (self.distance > 0):
+            return OffsetPolygon(self.polygon, self.distance + distance)
+        return self._grow_on_grid(distance, x_axis, z_axis)
+
+    def create_mpl_patch(self):
+        """Create a matplotlib patch for the region, following the outline
+        of its mask on a 256 x 256 grid over the bounding box.
+
+        Returns
+        -------
+        patch : matplotlib patch or None
+            None for an empty region
+
+        """
+        grid = self._outline_grid()
+        if grid is None:
+            return None
+        x_axis, z_axis = grid
+        return _mask_outline_patch(self.create_mask(x_axis, z_axis), x_axis,
+            z_axis)
+
+
+class RegionUnion(Region):
+    def __init__(self, region_list):
+        """
+        """
+        # make sure all regions in the list inherit from Region class
+        for region in region_list:
+            if not issubclass(type(region), Region):
+                raise ValueError('region_list includes a non-Region object.')
+        self.region_list = region_list
+
+    def create_mask(self, x_axis, z_axis):
+        """
+        Create a mask from a grid.
 
         Parameters
         ----------
@@ -364,11 +1369,122 @@ class RegionUnion(Region):
             mask_list.append(region.create_mask(x_axis, z_axis))
 
         # combine masks
+        t0 = Profiler.tic()
         mask = np.sum( np.asarray(mask_list), axis=0, keepdims=False).astype(bool)
+        Profiler.toc(t0, self, 'combine', mask.size * len(mask_list), mask)
 
         return mask
 
 
+    def bounding_box(self):
+        """Return the bounding box of the region.
+
+        Returns
+        -------
+        bbox : tuple
+            (x_min, x_max, z_min, z_max)
+
+        """
+
+        bboxes = np.asarray([region.bounding_box()
+            for region in self.region_list], dtype=float).reshape(-1, 4)
+        return (np.min(bboxes[:, 0], initial=np.inf),
+            np.max(bboxes[:, 1], initial=-np.inf),
+            np.min(bboxes[:, 2], initial=np.inf),
+            np.max(bboxes[:, 3], initial=-np.inf))
+
+    def contains_points(self, x, z):
+        """Test if points are inside the region.
+
+        Parameters
+        ----------
+        x : ndarray
+            x- (lateral) coordinates of the points
+        z : ndarray
+            z- (axial) coordinates of the points
+
+        Returns
+        -------
+        inside : ndarray (boolean values)
+            same shape as the broadcast of x and z
+
+        """
+
+        x, z = np.broadcast_arrays(x, z)
+        inside = np.zeros(x.shape, dtype=bool)
+        for region in self.region_list:
+            inside |= region.contains_points(x, z)
+        return inside
+
+    def intersects_box(self, x_min, x_max, z_min, z_max):
+        """Test if the region intersects an axis-aligned box.
+
+        Parameters
+        ----------
+        x_min, x_max : float
+            lateral extent of the box
+        z_min, z_max : float
+            axial extent of the box
+
+        Returns
+        -------
+        intersects : bool
+
+        """
+
+        return any(region.intersects_box(x_min, x_max, z_min, z_max)
+            for region in self.region_list)
+
+    def contains_box(self, x_min, x_max, z_min, z_max):
+        """Test if an axis-aligned box lies inside the region.
+
+        Parameters
+        ----------
+        x_min, x_max : float
+            lateral extent of the box
+        z_min, z_max : float
+            axial extent of the box
+
+        Returns
+        -------
+        contains : bool
+            False may also be returned for boxes that are inside but
+            covered by several regions
+
+        """
+
+        return any(region.contains_box(x_min, x_max, z_min, z_max)
+            for region in self.region_list)
+
+    def grow(self, distance, x_axis=None, z_axis=None):
+        """Grow the union by a margin, or shrink it for a negative distance.
+        Growing grows every region of the union, which is exact. Shrinking is
+        done on a grid with span-based erosion.
+
+        Parameters
+        ----------
+        distance : float
+            margin in the units of the region, negative values shrink it
+        x_axis : ndarray or None
+            x- (lateral) coordinates, needed when the margin is computed
+            on a grid
+        z_axis : ndarray or None
+            z- (axial) coordinates, needed when the margin is computed
+            on a grid
+
+        Returns
+        -------
+        region : Region
+
+        """
+
+        if distance == 0:
+            return RegionUnion(list(self.region_list))
+        if distance > 0 or len(self.region_list) == 1:
+            return RegionUnion([region.grow(distance, x_axis, z_axis)
+                for region in self.region_list])
+        return self._grow_on_grid(distance, x_axis, z_axis)
+
     def create_mpl_patch(self):
         """
         """
@@ -412,11 +1528,127 @@ class RegionIntersect(Region):
             mask_list.append(region.create_mask(x_axis, z_axis))
 
         # combine masks
+        t0 = Profiler.tic()
         mask = np.prod( np.asarray(mask_list), axis=0, keepdims=False).astype(bool)
+        Profiler.toc(t0, self, 'combine', mask.size * len(mask_list), mask)
         
         return mask
 
 
+    def bounding_box(self):
+        """Return the bounding box of the region.
+
+        Returns
+        -------
+        bbox : tuple
+            (x_min, x_max, z_min, z_max)
+
+        """
+
+        # the box may be empty (min > max) if the regions do not overlap
+        bboxes = np.asarray([region.bounding_box()
+            for region in self.region_list], dtype=float).reshape(-1, 4)
+        return (np.max(bboxes[:, 0], initial=-np.inf),
+            np.min(bboxes[:, 1], initial=np.inf),
+            np.max(bboxes[:, 2], initial=-np.inf),
+            np.min(bboxes[:, 3], initial=np.inf))
+
+    def contains_points(self, x, z):
+        """Test if points are inside the region.
+
+        Parameters
+        ----------
+        x : ndarray
+            x- (lateral) coordinates of the points
+        z : ndarray
+            z- (axial) coordinates of the points
+
+        Returns
+        -------
+        inside : ndarray (boolean values)
+            same shape as the broadcast of x and z
+
+        """
+
+        x, z = np.broadcast_arrays(x, z)
+        inside = np.ones(x.shape, dtype=bool)
+        for region in self.region_list:
+            inside &= region.contains_points(x, z)
+        return inside
+
+    def intersects_box(self, x_min, x_max, z_min, z_max):
+        """Test if the region intersects an axis-aligned box.
+
+        Parameters
+        ----------
+        x_min, x_max : float
+            lateral extent of the box
+        z_min, z_max : float
+            axial extent of the box
+
+        Returns
+        -------
+        intersects : bool
+
+        """
+
+        # conservative: every region must touch the box and their bounding
+        # boxes must overlap inside it, but the regions may still not
+        # intersect each other there
+        if not all(region.intersects_box(x_min, x_max, z_min, z_max)
+                for region in self.region_list):
+            return False
+        return _boxes_overlap(self.bounding_box(),
+            (x_min, x_max, z_min, z_max))
+
+    def contains_box(self, x_min, x_max, z_min, z_max):
+        """Test if an axis-aligned box lies inside the region.
+
+        Parameters
+        ----------
+        x_min, x_max : float
+            lateral extent of the box
+        z_min, z_max : float
+            axial extent of the box
+
+        Returns
+        -------
+        contains : bool
+
+        """
+
+        return all(region.contains_box(x_min, x_max, z_min, z_max)
+            for region in self.region_list)
+
+    def grow(self, distance, x_axis=None, z_axis=None):
+        """Grow the intersection by a margin, or shrink it for a negative
+        distance. Shrinking shrinks every region of the intersection, which is
+        exact. Growing is done on a grid with span-based dilation.
+
+        Parameters
+        ----------
+        distance : float
+            margin in the units of the region, negative values shrink it
+        x_axis : ndarray or None
+            x- (lateral) coordinates, needed when the margin is computed
+            on a grid
+        z_axis : ndarray or None
+            z- (axial) coordinates, needed when the margin is computed
+            on a grid
+
+        Returns
+        -------
+        region : Region
+
+        """
+
+        if distance == 0:
+            return RegionIntersect(list(self.region_list))
+        if distance < 0 or len(self.region_list) == 1:
+            return RegionIntersect([region.grow(distance, x_axis, z_axis)
+                for region in self.region_list])
+        return self._grow_on_grid(distance, x_axis, z_axis)
+
     def create_mpl_patch(self):
         """
         """
@@ -428,7 +1660,444 @@ class RegionIntersect(Region):
 
 
 
+class MaskRegion(Region):
+    def __init__(self, mask, x_axis, z_axis, units=None):
+        """Initialize region from a mask on a grid
+
+        Parameters
+        ----------
+        mask : ndarray (boolean values)
+            mask with shape (len(z_axis), len(x_axis))
+        x_axis : ndarray
+            increasing x- (lateral) coordinates of the mask
+        z_axis : ndarray
+            increasing z- (axial) coordinates of the mask
+        units : str
+            units of the axes
+        """
+        super().__init__()
+
+        mask = np.asarray(mask, dtype=bool)
+        x_axis = np.asarray(x_axis)
+        z_axis = np.asarray(z_axis)
+        if mask.shape != (len(z_axis), len(x_axis)):
+            raise ValueError("mask shape does not match the axes")
+        if np.any(np.diff(x_axis) <= 0) or np.any(np.diff(z_axis) <= 0):
+            raise ValueError("x_axis and z_axis should be increasing")
+
+        self.mask = mask
+        self.x_axis = x_axis
+        self.z_axis = z_axis
+        self.units = units
+        self.area = (mask.sum() * _pixel_spacing(x_axis)
+            * _pixel_spacing(z_axis))
+
+    def create_mask(self, x_axis, z_axis):
+        """
+        Create a mask from a grid. Each grid point takes the value of the
+        nearest pixel of the stored mask.
+
+        Parameters
+        ----------
+        x_axis : ndarray
+            x- (lateral) coordinates
+        z_axis : ndarray
+            z- (axial) coordinates
+        
+        Returns
+        -------
+        mask : ndarray (boolean values)
+
+        """
+
+        if self.mask.size == 0:
+            return np.zeros((len(z_axis), len(x_axis)), dtype=bool)
+
+        ix, valid_x = _nearest_index(self.x_axis, np.asarray(x_axis))
+        iz, valid_z = _nearest_index(self.z_axis, np.asarray(z_axis))
 
+        mask = self.mask[np.ix_(iz, ix)]
+        mask = mask & valid_z[:, np.newaxis] & valid_x[np.newaxis, :]
+
+        return mask
+
+    def bounding_box(self):
+        """Return the bounding box of the region.
+
+        Returns
+        -------
+        bbox : tuple
+            (x_min, x_max, z_min, z_max)
+
+        """
+
+        cols = np.nonzero(np.any(self.mask, axis=0))[0]
+        rows = np.nonzero(np.any(self.mask, axis=1))[0]
+        if cols.size == 0:
+            return (np.inf, -np.inf, np.inf, -np.inf)
+
+        # each pixel covers the points closer to it than to its neighbours
+        x_lower, x_upper = _pixel_edges(self.x_axis)
+        z_lower, z_upper = _pixel_edges(self.z_axis)
+        return (x_lower[cols[0]], x_upper[cols[-1]],
+            z_lower[rows[0]], z_upper[rows[-1]])
+
+    def contains_points(self, x, z):
+        """Test if points are inside the region.
+
+        Parameters
+        ----------
+        x : ndarray
+            x- (lateral) coordinates of the points
+        z : ndarray
+            z- (axial) coordinates of the points
+
+        Returns
+        -------
+        inside : ndarray (boolean values)
+            same shape as the broadcast of x and z
+
+        """
+
+        x, z = np.broadcast_arrays(x, z)
+        if self.mask.size == 0:
+            return np.zeros(x.shape, dtype=bool)
+        ix, valid_x = _nearest_index(self.x_axis, x)
+        iz, valid_z = _nearest_index(self.z_axis, z)
+        return self.mask[iz, ix] & valid_x & valid_z
+
+    def intersects_box(self, x_min, x_max, z_min, z_max):
+        """Test if the region intersects an axis-aligned box.
+
+        Parameters
+        ----------
+        x_min, x_max : float
+            lateral extent of the box
+        z_min, z_max : float
+            axial extent of the box
+
+        Returns
+        -------
+        intersects : bool
+
+        """
+
+        x_lower, x_upper = _pixel_edges(self.x_axis)
+        z_lower, z_upper = _pixel_edges(self.z_axis)
+        cols = (x_upper >= x_min) & (x_lower <= x_max)
+        rows = (z_upper >= z_min) & (z_lower <= z_max)
+        return bool(np.any(self.mask[np.ix_(rows, cols)]))
+
+    def contains_box(self, x_min, x_max, z_min, z_max):
+        """Test if an axis-aligned box lies inside the region.
+
+        Parameters
+        ----------
+        x_min, x_max : float
+            lateral extent of the box
+        z_min, z_max : float
+            axial extent of the box
+
+        Returns
+        -------
+        contains : bool
+
+        """
+
+        if self.mask.size == 0:
+            return False
+
+        # grid points in the box take values from a block of mask pixels
+        ix, valid_x = _nearest_index(self.x_axis, np.asarray([x_min, x_max]))
+        iz, valid_z = _nearest_index(self.z_axis, np.asarray([z_min, z_max]))
+        if not (np.all(valid_x) and np.all(valid_z)):
+            return False
+        return bool(np.all(self.mask[iz[0]:iz[1] + 1, ix[0]:ix[1] + 1]))
+
+    def grow(self, distance, x_axis=None, z_axis=None):
+        """Grow the region by a margin, or shrink it for a negative distance,
+        with span-based dilation or erosion on the grid of the mask.
+
+        Parameters
+        ----------
+        distance : float
+            margin in the units of the region, negative values shrink it
+        x_axis : ndarray or None
+            x- (lateral) coordinates, defaults to the axis of the mask
+        z_axis : ndarray or None
+            z- (axial) coordinates, defaults to the axis of the mask
+
+        Returns
+        -------
+        region : MaskRegion
+
+        """
+
+        if x_axis is None or z_axis is None:
+            x_axis = self.x_axis
+            z_axis = self.z_axis
+            # pad the grid so the region can grow past the stored mask
+            if distance > 0:
+                x_axis = _pad_axis(x_axis, distance)
+                z_axis = _pad_axis(z_axis, distance)
+        return self._grow_on_grid(distance, x_axis, z_axis)
+
+    def create_mpl_patch(self):
+        """Create a matplotlib patch for the region, following the edges of
+        the mask pixels.
+
+        Returns
+        -------
+        patch : matplotlib patch or None
+            None for an empty region
+
+        """
+        return _mask_outline_patch(self.mask, self.x_axis, self.z_axis)
+
+
+def crop_to_regions(region_list, x_axis, z_axis):
+    """Find the part of a grid covered by the union of regions.
+
+    The crop is padded by one pixel on each side so that points lying exactly
+    on a region boundary are kept.
+
+    Parameters
+    ----------
+    region_list : list of Region
+        regions that must lie inside the crop
+    x_axis : ndarray
+        x- (lateral) coordinates
+    z_axis : ndarray
+        z- (axial) coordinates
+
+    Returns
+    -------
+    z_slice : slice
+        rows of the grid inside the crop
+    x_slice : slice
+        columns of the grid inside the crop
+
+    """
+    x_axis = np.asarray(x_axis)
+    z_axis = np.asarray(z_axis)
+
+    bboxes = np.asarray([region.bounding_box()
+        for region in region_list], dtype=float).reshape(-1, 4)
+    x_min, z_min = np.min(bboxes[:, [0, 2]], axis=0, initial=np.inf)
+    x_max, z_max = np.max(bboxes[:, [1, 3]], axis=0, initial=-np.inf)
+
+    return (_axis_slice(z_axis, z_min, z_max),
+        _axis_slice(x_axis, x_min, x_max))
+
+
+def _boxes_overlap(bbox_a, bbox_b):
+    """Test if two (x_min, x_max, z_min, z_max) boxes overlap."""
+    return bool( max(bbox_a[0], bbox_b[0]) <= min(bbox_a[1], bbox_b[1])
+        and max(bbox_a[2], bbox_b[2]) <= min(bbox_a[3], bbox_b[3]) )
+
+
+def _segments_intersect_box(start, end, x_min, x_max, z_min, z_max):
+    """Test which segments intersect a box (Liang-Barsky clipping).
+
+    Parameters
+    ----------
+    start, end : ndarray
+        Nx2 arrays with the end points of the segments
+
+    Returns
+    -------
+    intersects : ndarray (boolean values)
+
+    """
+    d = end - start
+    t_low = np.zeros(len(start))
+    t_high = np.ones(len(start))
+    inside = np.ones(len(start), dtype=bool)
+    for p, q in [(-d[:, 0], start[:, 0] - x_min),
+            (d[:, 0], x_max - start[:, 0]),
+            (-d[:, 1], start[:, 1] - z_min),
+            (d[:, 1], z_max - start[:, 1])]:
+        parallel = (p == 0)
+        inside &= ~(parallel & (q < 0))
+        with np.errstate(divide='ignore', invalid='ignore'):
+            t = q / p
+        t_low = np.where(~parallel & (p < 0), np.maximum(t_low, t), t_low)
+        t_high = np.where(~parallel & (p > 0), np.minimum(t_high, t), t_high)
+    return inside & (t_low <= t_high)
+
+
+def _axis_slice(axis, lower, upper):
+    """Return the slice of an axis covering [lower, upper], padded by one
+    sample on each side."""
+    idx = np.nonzero((axis >= lower) & (axis <= upper))[0]
+    if idx.size == 0:
+        return slice(0, 0)
+    return slice(max(idx[0] - 1, 0), min(idx[-1] + 2, len(axis)))
+
+
+def _pixel_spacing(axis):
+    """Return the mean sample spacing of an axis (1 for a single sample)."""
+    if len(axis) < 2:
+        return 1.0
+    return abs(axis[-1] - axis[0]) / (len(axis) - 1)
+
+
+def _pad_axis(axis, distance):
+    """Extend an evenly spaced axis by at least distance on both sides."""
+    spacing = _pixel_spacing(axis)
+    n = int(np.ceil(distance / spacing)) + 1
+    steps = np.arange(1, n + 1) * spacing
+    return np.concatenate([axis[0] - steps[::-1], axis, axis[-1] + steps])
+
+
+def _nearest_index(axis, values):
+    """Return the index of the nearest sample of an increasing axis for each
+    value, and whether the value lies within half a sample of the axis."""
+    values = np.asarray(values)
+    if len(axis) == 0:
+        return (np.zeros(values.shape, dtype=np.intp),
+            np.zeros(values.shape, dtype=bool))
+
+    idx = np.clip(np.searchsorted(axis, values), 1, max(len(axis) - 1, 1))
+    lower = axis[idx - 1]
+    upper = axis[np.minimum(idx, len(axis) - 1)]
+    idx = np.where(np.abs(values - lower) <= np.abs(upper - values),
+        idx - 1, np.minimum(idx, len(axis) - 1))
+
+    half = _pixel_spacing(axis) / 2 if len(axis) > 1 else 0
+    valid = (values >= axis[0] - half) & (values <= axis[-1] + half)
+    return idx, valid
+
+
+def _pixel_edges(axis):
+    """Return the lower and upper edges of the pixels of an increasing axis,
+    the points of which have the pixel as their nearest valid sample (see
+    _nearest_index())."""
+    axis = np.asarray(axis, dtype=float)
+    half = _pixel_spacing(axis) / 2 if len(axis) > 1 else 0
+    mid = (axis[1:] + axis[:-1]) / 2
+    lower = np.concatenate([axis[:1] - half, mid])
+    upper = np.concatenate([mid, axis[-1:] + half])
+    return lower, upper
+
+
+def _mask_outline_patch(mask, x_axis, z_axis):
+    """Return a patch drawing the boundary between the pixels inside and
+    outside a mask on increasing axes, or None for an empty mask."""
+    if not np.any(mask):
+        return None
+
+    x_lower, x_upper = _pixel_edges(x_axis)
+    z_lower, z_upper = _pixel_edges(z_axis)
+    x_edges = np.concatenate([x_lower[:1], x_upper])
+    z_edges = np.concatenate([z_lower[:1], z_upper])
+    padded = np.pad(mask, 1)
+
+    # vertical and horizontal pixel sides with inside and outside neighbours
+    rows, cols = np.nonzero(padded[1:-1, 1:] != padded[1:-1, :-1])
+    vertical = np.stack([np.column_stack([x_edges[cols], z_edges[rows]]),
+        np.column_stack([x_edges[cols], z_edges[rows + 1]])], axis=1)
+    rows, cols = np.nonzero(padded[1:, 1:-1] != padded[:-1, 1:-1])
+    horizontal = np.stack([np.column_stack([x_edges[cols], z_edges[rows]]),
+        np.column_stack([x_edges[cols + 1], z_edges[rows]])], axis=1)
+
+    segments = np.concatenate([vertical, horizontal])
+    codes = np.tile([mpath.Path.MOVETO, mpath.Path.LINETO], len(segments))
+    path = mpath.Path(segments.reshape(-1, 2), codes)
+    return mpatches.PathPatch(path, edgecolor='red', facecolor="None")
+
+
+def _dilate_spans(mask, radius_x, radius_z):
+    """Dilate a mask with an elliptical structuring element.
+
+    The element is decomposed into one horizontal run of pixels per row
+    offset; each run is applied with a cumulative sum along the rows, so the
+    cost is proportional to the number of row offsets times the mask size.
+
+    Parameters
+    ----------
+    mask : ndarray (boolean values)
+    radius_x : float
+        lateral radius of the element in pixels
+    radius_z : float
+        axial radius of the element in pixels
+
+    Returns
+    -------
+    dilated : ndarray (boolean values)
+
+    """
+    nz, nx = mask.shape
+    cumulative = np.zeros((nz, nx + 1), dtype=np.int64)
+    np.cumsum(mask, axis=1, out=cumulative[:, 1:])
+    cols = np.arange(nx)
+
+    rows = {}
+    dilated = np.zeros(mask.shape, dtype=bool)
+    reach_z = int(np.floor(radius_z + 1e-9))
+    for dz in range(-reach_z, reach_z + 1):
+        ratio = dz / radius_z if radius_z > 0 else 0
+        half = int(np.floor(radius_x * np.sqrt(max(1 - ratio ** 2, 0))
+            + 1e-9))
+        if half not in rows:
+            lo = np.clip(cols - half, 0, nx)
+            hi = np.clip(cols + half + 1, 0, nx)
+            rows[half] = (cumulative[:, hi] - cumulative[:, lo]) > 0
+        run = rows[half]
+
+        # pixel (i, j) is set if row i - dz has a set pixel within the run
+        if dz >= 0:
+            dilated[dz:] |= run[:nz - dz]
+        else:
+            dilated[:nz + dz] |= run[-dz:]
+
+    return dilated
+
+
+def _point_segment_distance(x, z, start, end):
+    """Return the distance between points and segments.
+
+    Parameters
+    ----------
+    x, z : ndarray
+        coordinates of the points, broadcast against the segments
+    start, end : ndarray
+        end points of the segments, shape (2,) or Nx2
+
+    Returns
+    -------
+    dist : ndarray
+
+    """
+    start = np.asarray(start, dtype=float)
+    end = np.asarray(end, dtype=float)
+    dx = end[..., 0] - start[..., 0]
+    dz = end[..., 1] - start[..., 1]
+    length_sq = dx ** 2 + dz ** 2
+    with np.errstate(divide='ignore', invalid='ignore'):
+        t = ((x - start[..., 0]) * dx + (z - start[..., 1]) * dz) / length_sq
+    t = np.where(length_sq > 0, np.clip(t, 0, 1), 0)
+    return np.sqrt((x - start[..., 0] - t * dx) ** 2
+        + (z - start[..., 1] - t * dz) ** 2)
+
+
+def _box_segment_distance(start, end, x_min, x_max, z_min, z_max):
+    """Return the distance between a box and each of the Nx2 segments."""
+    # for disjoint convex shapes the closest points include a vertex of
+    # one of them
+    def point_box_distance(x, z):
+        return np.sqrt(np.maximum(np.maximum(x_min - x, x - x_max), 0) ** 2
+            + np.maximum(np.maximum(z_min - z, z - z_max), 0) ** 2)
+
+    dist = np.minimum(point_box_distance(start[:, 0], start[:, 1]),
+        point_box_distance(end[:, 0], end[:, 1]))
+    for x, z in [(x_min, z_min), (x_min, z_max), (x_max, z_min),
+            (x_max, z_max)]:
+        dist = np.minimum(dist, _point_segment_distance(x, z, start, end))
+
+    crossing = _segments_intersect_box(start, end, x_min, x_max, z_min,
+        z_max)
+    return np.where(crossing, 0, dist)
 
 
 def create_region(**kwargs):
@@ -0,0 +1,284 @@
+import math
+
+import numpy as np
+
+import regions
+
+
+class RegionIndex:
+    """Uniform grid bucket index over a collection of regions.
+
+    Each region is stored in the grid cells covered by its bounding box.
+    Queries collect the regions in the cells they touch and refine the
+    candidates with the exact test of each shape type. Regions can be
+    inserted and removed at any time.
+
+    Example
+    -------
+    >>> index = RegionIndex(cell_size=5)
+    >>> for roi in rois:
+    ...     index.insert(roi)
+    >>> index.query_point(1.5, 22.0)
+    """
+    def __init__(self, cell_size, max_cells=4096):
+        """Initialize index
+
+        Parameters
+        ----------
+        cell_size : float
+            side length of the grid cells, in the units of the regions
+        max_cells : int
+            regions covering more cells than this (including unbounded
+            regions) are kept in a separate list checked by every query
+        """
+        if cell_size <= 0:
+            raise ValueError("cell_size should be positive")
+
+        self.cell_size = cell_size
+        self.max_cells = max_cells
+        self._regions = {}
+        self._bboxes = {}
+        self._cells = {}
+        self._order = {}
+        self._buckets = {}
+        self._large = set()
+        self._counter = 0
+
+    def __len__(self):
+        return len(self._regions)
+
+    def __contains__(self, key):
+        return key in self._regions
+
+    def __getitem__(self, key):
+        return self._regions[key]
+
+    def keys(self):
+        """Return the keys of the indexed regions in insertion order."""
+        return list(self._regions)
+
+    def _cell_range(self, x_min, x_max, z_min, z_max):
+        """Return (i0, i1, j0, j1) cell index bounds of a box, or None if the
+        box is unbounded or covers more than max_cells cells."""
+        bounds = (x_min, x_max, z_min, z_max)
+        if not np.all(np.isfinite(bounds)):
+            return None
+        i0 = math.floor(x_min / self.cell_size)
+        i1 = math.floor(x_max / self.cell_size)
+        j0 = math.floor(z_min / self.cell_size)
+        j1 = math.floor(z_max / self.cell_size)
+        if (i1 - i0 + 1) * (j1 - j0 + 1) > self.max_cells:
+            return None
+        return i0, i1, j0, j1
+
+    def insert(self, region, key=None):
+        """Add a region to the index.
+
+        Parameters
+        ----------
+        region : Region
+            region to add
+        key : hashable or None
+            key identifying the region, an integer is assigned if None
+
+        Returns
+        -------
+        key : hashable
+
+        """
+        bbox = self._checked_bbox(region)
+        if key is None:
+            while self._counter in self._regions:
+                self._counter += 1
+            key = self._counter
+        if key in self._regions:
+            raise KeyError(f'key {key!r} is already in the index')
+
+        self._add(key, region, bbox, self._counter)
+        self._counter += 1
+
+        return key
+
+    @staticmethod
+    def _checked_bbox(region):
+        """Validate a region and return its bounding box."""
+        if not isinstance(region, regions.Region):
+            raise ValueError('region is not a Region object.')
+        return tuple(float(v) for v in region.bounding_box())
+
+    def _add(self, key, region, bbox, order):
+        self._regions[key] = region
+        self._bboxes[key] = bbox
+        self._order[key] = order
+
+        if bbox[0] > bbox[1] or bbox[2] > bbox[3]:
+            # empty region, never returned by a query
+            self._cells[key] = []
+            return
+
+        cell_range = self._cell_range(*bbox)
+        if cell_range is None:
+            self._cells[key] = None
+            self._large.add(key)
+            return
+
+        i0, i1, j0, j1 = cell_range
+        cells = [(i, j) for i in range(i0, i1 + 1) for j in range(j0, j1 + 1)]
+        for cell in cells:
+            self._buckets.setdefault(cell, set()).add(key)
+        self._cells[key] = cells
+
+    def remove(self, key):
+        """Remove a region from the index.
+
+        Parameters
+        ----------
+        key : hashable
+            key returned by insert()
+
+        Returns
+        -------
+        region : Region
+            the removed region
+
+        """
+        region = self._regions.pop(key)
+        cells = self._cells.pop(key)
+        del self._bboxes[key]
+        del self._order[key]
+
+        if cells is None:
+            self._large.discard(key)
+        else:
+            for cell in cells:
+                bucket = self._buckets[cell]
+                bucket.discard(key)
+                if not bucket:
+                    del self._buckets[cell]
+
+        return region
+
+    def update(self, key, region):
+        """Replace the region stored under a key.
+
+        Parameters
+        ----------
+        key : hashable
+            key returned by insert()
+        region : Region
+            new region
+        """
+        # check the new region before the old one is removed
+        bbox = self._checked_bbox(region)
+        order = self._order[key]
+        self.remove(key)
+        self._add(key, region, bbox, order)
+
+    def _candidates(self, x_min, x_max, z_min, z_max):
+        """Return keys whose bounding box overlaps a box."""
+        found = set(self._large)
+        cell_range = self._cell_range(x_min, x_max, z_min, z_max)
+        if cell_range is None or ((cell_range[1] - cell_range[0] + 1)
+                * (cell_range[3] - cell_range[2] + 1) > len(self._buckets)):
+            # cheaper to visit the occupied cells than the covered ones
+            for key in self._cells:
+                if self._cells[key]:
+                    found.add(key)
+        else:
+            i0, i1, j0, j1 = cell_range
+            for i in range(i0, i1 + 1):
+                for j in range(j0, j1 + 1):
+                    found.update(self._buckets.get((i, j), ()))
+
+        keys = []
+        for key in found:
+            bx_min, bx_max, bz_min, bz_max = self._bboxes[key]
+            if (bx_min <= x_max and x_min <= bx_max and bz_min <= z_max
+                    and z_min <= bz_max):
+                keys.append(key)
+        return keys
+
+    def _sorted(self, keys):
+        return sorted(keys, key=self._order.__getitem__)
+
+    def query_point(self, x, z):
+        """Find the regions containing a point.
+
+        Parameters
+        ----------
+        x : float
+            x- (lateral) coordinate
+        z : float
+            z- (axial) coordinate
+
+        Returns
+        -------
+        keys : list
+            keys of the regions containing the point, in insertion order
+
+        """
+        return self._sorted(key for key in self._candidates(x, x, z, z)
+            if self._regions[key].contains_points(x, z))
+
+    def query_window(self, x_min, x_max, z_min, z_max):
+        """Find the regions that intersect an axis-aligned window.
+
+        Parameters
+        ----------
+        x_min, x_max : float
+            lateral extent of the window
+        z_min, z_max : float
+            axial extent of the window
+
+        Returns
+        -------
+        keys : list
+            keys of the regions intersecting the window, in insertion order
+
+        """
+        return self._sorted(key
+            for key in self._candidates(x_min, x_max, z_min, z_max)
+            if self._regions[key].intersects_box(x_min, x_max, z_min, z_max))
+
+    def query_region(self, region, x_axis=None, z_axis=None):
+        """Find the regions that overlap another region.
+
+        Without a grid, candidates are refined by testing each region
+        against the bounding box of the other, which may report regions
+        that only come close. With a grid, the overlap is tested exactly on
+        the pixels of the grid.
+
+        Parameters
+        ----------
+        region : Region
+            region to test
+        x_axis : ndarray or None
+            x- (lateral) coordinates
+        z_axis : ndarray or None
+            z- (axial) coordinates
+
+        Returns
+        -------
+        keys : list
+            keys of the overlapping regions, in insertion order
+
+        """
+        bbox = region.bounding_box()
+        found = []
+        for key in self._candidates(*bbox):
+            other = self._regions[key]
+            if not (other.intersects_box(*bbox)
+                    and region.intersects_box(*self._bboxes[key])):
+                continue
+            if x_axis is not None and z_axis is not None:
+                overlap = regions.RegionIntersect([region, other])
+                z_slice, x_slice = regions.crop_to_regions([overlap],
+                    x_axis, z_axis)
+                x_crop = np.asarray(x_axis)[x_slice]
+                z_crop = np.asarray(z_axis)[z_slice]
+                if (len(x_crop) == 0 or len(z_crop) == 0
+                        or not np.any(overlap.create_mask(x_crop, z_crop))):
+                    continue
+            found.append(key)
+
+        return self._sorted(found)
@@ -0,0 +1,145 @@
+#!/usr/bin/env python
+
+import pickle
+import unittest
+
+import numpy as np
+
+import regions
+from accumulators import QuantileSketch, RegionAccumulator
+
+
+class TestCode(unittest.TestCase):
+
+    def setUp(self):
+        rng = np.random.default_rng(1)
+        self.x_axis = np.linspace(-5, 5, 41)
+        self.z_axis = np.linspace(0, 10, 41)
+        self.frames = rng.normal(3, 2, (6, len(self.z_axis), len(self.x_axis)))
+        self.region = regions.Circle(0, 5, 3, 'mm')
+        self.bin_edges = np.linspace(-2, 8, 21)
+
+    def test_QuantileSketch(self):
+        """Test quantile estimates are within the relative accuracy"""
+        rng = np.random.default_rng(2)
+        values = np.concatenate([rng.lognormal(0, 2, 5000),
+            -rng.lognormal(0, 1, 1000), np.zeros(10)])
+        sketch = QuantileSketch(relative_accuracy=0.01)
+        sketch.update(values)
+        self.assertEqual(sketch.count, values.size)
+
+        q = np.asarray([0, 0.01, 0.1, 0.25, 0.5, 0.9, 0.99, 1])
+        estimates = sketch.quantile(q)
+        actual = np.quantile(values, q, method='lower')
+        self.assertTrue(np.all(np.abs(estimates - actual)
+            <= 0.01 * np.abs(actual) + 1e-12))
+
+        # merging two halves gives the same sketch as adding everything
+        a = QuantileSketch(relative_accuracy=0.01)
+        b = QuantileSketch(relative_accuracy=0.01)
+        a.update(values[::2])
+        b.update(values[1::2])
+        a.merge(b)
+        self.assertTrue(np.allclose(a.quantile(q), estimates))
+
+        self.assertTrue(np.isnan(QuantileSketch().quantile(0.5)))
+        with self.assertRaises(ValueError):
+            a.merge(QuantileSketch(relative_accuracy=0.02))
+
+    def test_QuantileSketch_max_bins(self):
+        """Test the sketch stays bounded for values with a huge range"""
+        sketch = QuantileSketch(relative_accuracy=0.01, max_bins=512)
+        values = np.concatenate([np.linspace(1, 100, 1000), [1e300]])
+        sketch.update(values)
+        sketch.update([np.inf, -np.inf, np.nan])
+        self.assertEqual(sketch.count, values.size)
+        self.assertLessEqual(sketch._positive.counts.size, 512)
+
+        # only the smallest magnitudes lose accuracy
+        self.assertLessEqual(abs(sketch.quantile(1) - 1e300), 0.01 * 1e300)
+        other = QuantileSketch(relative_accuracy=0.01, max_bins=512)
+        other.update(-values)
+        sketch.merge(other)
+        self.assertLessEqual(sketch._negative.counts.size, 512)
+        self.assertLessEqual(abs(sketch.quantile(0) + 1e300), 0.01 * 1e300)
+
+    def test_RegionAccumulator_nonfinite(self):
+        """Test nan and inf values are skipped without corrupting state"""
+        acc = RegionAccumulator(self.region, self.x_axis, self.z_axis,
+            bin_edges=self.bin_edges)
+        frame = self.frames[0].copy()
+        frame[20, 20] = np.inf
+        frame[20, 21] = np.nan
+        acc.update(frame)
+
+        values = self.region.get_values_in_region(frame, self.x_axis,
+            self.z_axis)
+        values = values[np.isfinite(values)]
+        self.assertEqual(acc.nonfinite, 2)
+        self.assertEqual(acc.count, values.size)
+        self.assertTrue(np.isclose(acc.mean, values.mean()))
+        self.assertEqual(acc.max, values.max())
+        self.assertEqual(acc.hist.sum() + acc.underflow + acc.overflow,
+            values.size)
+
+        acc_other = RegionAccumulator(self.region, self.x_axis, self.z_axis,
+            bin_edges=self.bin_edges, relative_accuracy=0.02)
+        acc_other.update(self.frames[1])
+        with self.assertRaises(ValueError):
+            acc.merge(acc_other)
+        self.assertEqual(acc.count, values.size)
+
+    def test_RegionAccumulator(self):
+        """Test streamed statistics match statistics of all values"""
+        acc = RegionAccumulator(self.region, self.x_axis, self.z_axis,
+            bin_edges=self.bin_edges)
+        for frame in self.frames:
+            acc.update(frame)
+
+        values = np.concatenate([self.region.get_values_in_region(frame,
+            self.x_axis, self.z_axis) for frame in self.frames])
+        self.assertEqual(acc.count, values.size)
+        self.assertEqual(acc.n_pixels * len(self.frames), values.size)
+        self.assertTrue(np.isclose(acc.mean, values.mean()))
+        self.assertTrue(np.isclose(acc.var(), values.var()))
+        self.assertTrue(np.isclose(acc.std(ddof=1), values.std(ddof=1)))
+        self.assertEqual(acc.min, values.min())
+        self.assertEqual(acc.max, values.max())
+
+        hist, edges = acc.histogram()
+        self.assertTrue(np.array_equal(hist,
+            np.histogram(values, self.bin_edges)[0]))
+        self.assertEqual(acc.underflow + acc.overflow + hist.sum(),
+            values.size)
+
+        median = np.quantile(values, 0.5, method='lower')
+        self.assertLessEqual(abs(acc.median() - median), 0.01 * abs(median))
+
+    def test_RegionAccumulator_merge(self):
+        """Test accumulators from separate workers merge exactly"""
+        acc_all = RegionAccumulator(self.region, self.x_axis, self.z_axis,
+            bin_edges=self.bin_edges)
+        acc_all.update(self.frames)
+
+        acc_a = RegionAccumulator(self.region, self.x_axis, self.z_axis,
+            bin_edges=self.bin_edges)
+        acc_b = RegionAccumulator(self.region, self.x_axis, self.z_axis,
+            bin_edges=self.bin_edges)
+        acc_a.update(self.frames[:2])
+        acc_b.update(self.frames[2:])
+        acc_a.merge(pickle.loads(pickle.dumps(acc_b)))
+
+        self.assertEqual(acc_a.count, acc_all.count)
+        self.assertTrue(np.isclose(acc_a.mean, acc_all.mean))
+        self.assertTrue(np.isclose(acc_a.var(), acc_all.var()))
+        self.assertTrue(np.array_equal(acc_a.hist, acc_all.hist))
+        self.assertTrue(np.allclose(acc_a.quantile([0.1, 0.5, 0.9]),
+            acc_all.quantile([0.1, 0.5, 0.9])))
+
+        acc_c = RegionAccumulator(self.region, self.x_axis, self.z_axis)
+        with self.assertRaises(ValueError):
+            acc_a.merge(acc_c)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,128 @@
+#!/usr/bin/env python
+
+import os
+import tempfile
+import unittest
+
+import numpy as np
+
+import regions
+from mask_cache import MaskCache
+
+
+class TestCode(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.x_axis = np.linspace(0, 2, 11)
+        self.z_axis = np.linspace(0, 2, 7)
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_MaskCache(self):
+        """Test masks round-trip through the cache"""
+        cache = MaskCache(self.tmp_dir.name)
+        a_polygon = regions.Polygon('test_vertices.txt', 'mm')
+        a_circle = regions.Circle(1, 1, 0.7, 'mm')
+        a_region_union = regions.RegionUnion([a_polygon, a_circle])
+
+        for region in [a_polygon, a_circle, a_region_union]:
+            self.assertIsNone(cache.get(region, self.x_axis, self.z_axis))
+            mask = cache.create_mask(region, self.x_axis, self.z_axis)
+            mask_actual = region.create_mask(self.x_axis, self.z_axis)
+            self.assertTrue(np.array_equal(mask, mask_actual))
+
+            mask = cache.get(region, self.x_axis, self.z_axis)
+            self.assertEqual(mask.dtype, bool)
+            self.assertTrue(np.array_equal(mask, mask_actual))
+
+        # regions and grids with different parameters do not collide
+        keys = {cache.key(a_circle, self.x_axis, self.z_axis),
+            cache.key(regions.Circle(1, 1, 0.8, 'mm'), self.x_axis,
+                self.z_axis),
+            cache.key(a_circle, self.x_axis + 0.1, self.z_axis),
+            cache.key(regions.Ellipse(1, 1, 0.7, 0.7, 'mm'), self.x_axis,
+                self.z_axis)}
+        self.assertEqual(len(keys), 4)
+
+        # the key does not depend on how the parameters were typed
+        keys = {cache.key(regions.Circle(1, 1, 2, 'mm'), self.x_axis,
+                self.z_axis),
+            cache.key(regions.Circle(1.0, 1.0, 2.0, 'mm'), self.x_axis,
+                self.z_axis),
+            cache.key(regions.Circle(np.float64(1), 1, 2, 'mm'),
+                list(self.x_axis), self.z_axis)}
+        self.assertEqual(len(keys), 1)
+        self.assertEqual(
+            cache.key(regions.Polygon([[0, 0], [1, 0], [0, 1]], 'mm'),
+                self.x_axis, self.z_axis),
+            cache.key(regions.Polygon([[0.0, 0.0], [1.0, 0.0], [0.0, 1.0]],
+                'mm'), self.x_axis, self.z_axis))
+
+        # values come from the cached mask
+        img = np.ones((len(self.z_axis), len(self.x_axis)))
+        region_values = cache.get_values_in_region(a_circle, img,
+            self.x_axis, self.z_axis)
+        self.assertEqual(region_values.size,
+            a_circle.create_mask(self.x_axis, self.z_axis).sum())
+
+        cache.clear()
+        self.assertEqual(cache.size(), 0)
+
+    def test_MaskCache_eviction(self):
+        """Test the cache stays within max_bytes"""
+        cache = MaskCache(self.tmp_dir.name)
+        a_circle = regions.Circle(1, 1, 0.5, 'mm')
+        cache.create_mask(a_circle, self.x_axis, self.z_axis)
+        entry_size = cache.size()
+
+        # make the first mask the least recently used one
+        path = cache._path(cache.key(a_circle, self.x_axis, self.z_axis))
+        os.utime(path, (1e9, 1e9))
+
+        cache = MaskCache(self.tmp_dir.name, max_bytes=2 * entry_size)
+        for radius in [0.6, 0.7]:
+            region = regions.Circle(1, 1, radius, 'mm')
+            cache.create_mask(region, self.x_axis, self.z_axis)
+
+        self.assertLessEqual(cache.size(), 2 * entry_size)
+        self.assertIsNone(cache.get(a_circle, self.x_axis, self.z_axis))
+        for radius in [0.6, 0.7]:
+            self.assertIsNotNone(cache.get(regions.Circle(1, 1, radius, 'mm'),
+                self.x_axis, self.z_axis))
+
+    def test_MaskCache_tmp_files(self):
+        """Test temporary files of failed writers count towards max_bytes"""
+        cache = MaskCache(self.tmp_dir.name)
+        a_circle = regions.Circle(1, 1, 0.5, 'mm')
+        cache.create_mask(a_circle, self.x_axis, self.z_axis)
+        entry_size = cache.size()
+
+        # a writer that died long ago and one that is still writing
+        stale_path = os.path.join(self.tmp_dir.name, 'stale.tmp')
+        live_path = os.path.join(self.tmp_dir.name, 'live.tmp')
+        for path in [stale_path, live_path]:
+            with open(path, 'wb') as f:
+                f.write(b'0' * entry_size)
+        os.utime(stale_path, (1e9, 1e9))
+        self.assertEqual(cache.size(), 3 * entry_size)
+
+        cache = MaskCache(self.tmp_dir.name, max_bytes=2 * entry_size)
+        cache.evict()
+        self.assertFalse(os.path.exists(stale_path))
+        self.assertTrue(os.path.exists(live_path))
+        self.assertLessEqual(cache.size(), 2 * entry_size)
+
+        # the live temporary file leaves room for one mask only
+        cache.create_mask(regions.Circle(1, 1, 0.6, 'mm'), self.x_axis,
+            self.z_axis)
+        self.assertLessEqual(cache.size(), 2 * entry_size)
+        self.assertIsNone(cache.get(a_circle, self.x_axis, self.z_axis))
+
+        cache.clear()
+        self.assertEqual(os.listdir(self.tmp_dir.name), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,93 @@
+#!/usr/bin/env python
+
+import unittest
+
+import numpy as np
+
+import regions
+import metrics
+
+
+class TestCode(unittest.TestCase):
+
+    def setUp(self):
+        rng = np.random.default_rng(0)
+        self.x_axis = np.linspace(-10, 10, 81)
+        self.z_axis = np.linspace(0, 30, 121)
+        self.frames = rng.rayleigh(1, (4, len(self.z_axis), len(self.x_axis)))
+        self.frames[:, 40:80, 30:50] *= 3
+        self.target = regions.Circle(0, 15, 3, 'mm')
+        self.background = regions.Annulus(0, 15, 4, 6, 'mm')
+
+    def test_region_moments(self):
+        """Test moments match values extracted region by region"""
+        n, mean, var = metrics.region_moments([self.target, self.background],
+            self.frames, self.x_axis, self.z_axis)
+        self.assertEqual(mean.shape, (4, 2))
+        for i, region in enumerate([self.target, self.background]):
+            for k, frame in enumerate(self.frames):
+                vals = region.get_values_in_region(frame, self.x_axis,
+                    self.z_axis)
+                self.assertEqual(n[i], vals.size)
+                self.assertTrue(np.isclose(mean[k, i], vals.mean()))
+                self.assertTrue(np.isclose(var[k, i], vals.var()))
+
+    def test_contrast_metrics(self):
+        """Test contrast, CNR and gCNR against a direct computation"""
+        result = metrics.contrast_metrics(self.target, self.background,
+            self.frames, self.x_axis, self.z_axis, bins=64)
+        for k, frame in enumerate(self.frames):
+            t = self.target.get_values_in_region(frame, self.x_axis,
+                self.z_axis)
+            b = self.background.get_values_in_region(frame, self.x_axis,
+                self.z_axis)
+            self.assertTrue(np.isclose(result['contrast'][k],
+                t.mean() / b.mean()))
+            self.assertTrue(np.isclose(result['cnr'][k],
+                abs(t.mean() - b.mean()) / np.sqrt(t.var() + b.var())))
+
+            edges = np.linspace(min(t.min(), b.min()), max(t.max(), b.max()),
+                65)
+            h_t = np.histogram(t, edges)[0] / t.size
+            h_b = np.histogram(b, edges)[0] / b.size
+            self.assertTrue(np.isclose(result['gcnr'][k],
+                1 - np.minimum(h_t, h_b).sum()))
+
+        # a single 2D frame gives scalars
+        result = metrics.contrast_metrics(self.target, self.background,
+            self.frames[0], self.x_axis, self.z_axis)
+        self.assertEqual(np.ndim(result['gcnr']), 0)
+        self.assertTrue(0 <= result['gcnr'] <= 1)
+
+    def test_compute_contrast_metrics(self):
+        """Test several pairs sharing regions"""
+        other = regions.Square(0, 15, 2, 'mm')
+        results = metrics.compute_contrast_metrics(
+            [(self.target, self.background), (other, self.background)],
+            self.frames, self.x_axis, self.z_axis,
+            bins=np.linspace(0, 15, 31))
+        self.assertEqual(len(results), 2)
+        single = metrics.contrast_metrics(other, self.background,
+            self.frames, self.x_axis, self.z_axis,
+            bins=np.linspace(0, 15, 31))
+        for key in ['contrast', 'cnr', 'gcnr']:
+            self.assertTrue(np.allclose(results[1][key], single[key]))
+
+        # with a number of bins, each pair gets its own range
+        bright = regions.Square(-5, 5, 2, 'mm')
+        frames = self.frames.copy()
+        frames[:, 10:20, 15:25] = 100
+        results = metrics.compute_contrast_metrics(
+            [(self.target, self.background), (bright, self.background)],
+            frames, self.x_axis, self.z_axis, bins=64)
+        single = metrics.contrast_metrics(self.target, self.background,
+            frames, self.x_axis, self.z_axis, bins=64)
+        for key in ['contrast', 'cnr', 'gcnr']:
+            self.assertTrue(np.allclose(results[0][key], single[key]))
+
+        self.assertEqual(metrics.compute_contrast_metrics([], self.frames,
+            self.x_axis, self.z_axis), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
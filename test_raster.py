@@ -0,0 +1,111 @@
+#!/usr/bin/env python
+
+import unittest
+
+import numpy as np
+
+import regions
+import raster
+
+
+class TestCode(unittest.TestCase):
+
+    def setUp(self):
+        self.x_axis = np.linspace(-10, 10, 151)
+        self.z_axis = np.linspace(0, 20, 133)
+
+        t = np.linspace(0, 2 * np.pi, 200, endpoint=False)
+        r = 6 + 2 * np.sin(5 * t)
+        a_star = regions.Polygon(np.column_stack([r * np.cos(t),
+            10 + r * np.sin(t)]), 'mm')
+        a_circle = regions.Circle(0, 10, 4, 'mm')
+        a_square = regions.Square(-2, 8, 6, 'mm')
+        a_ellipse = regions.Ellipse(1, 12, 7, 3, 'mm')
+        self.region_list = [a_star, a_circle, a_square, a_ellipse,
+            regions.Annulus(1, 9, 2, 7, 'mm'),
+            regions.Polygon('test_vertices.txt', 'mm'),
+            regions.RegionUnion([a_square, a_ellipse]),
+            regions.RegionIntersect([a_star, a_circle]),
+            regions.RegionUnion([regions.RegionIntersect([a_ellipse,
+                a_square]), regions.Annulus(-5, 15, 1, 3, 'mm')]),
+            a_square.grow(1), a_star.grow(0.5), a_star.shrink(0.5),
+            regions.Region()]
+
+    def test_rasterize(self):
+        """Test tiled rasterization gives the same mask as create_mask"""
+        for region in self.region_list:
+            mask_actual = region.create_mask(self.x_axis, self.z_axis)
+            for tile_size, min_tile_size in [(32, 8), (16, 1), (7, 3)]:
+                mask = raster.rasterize(region, self.x_axis, self.z_axis,
+                    tile_size, min_tile_size)
+                self.assertTrue(np.array_equal(mask, mask_actual),
+                    type(region).__name__)
+
+    def test_rasterize_MaskRegion(self):
+        """Test a mask region rasterized on grids other than its own"""
+        x_coarse = np.linspace(-10, 10, 41)
+        z_coarse = np.linspace(0, 20, 41)
+        a_intersect = self.region_list[7]
+        grown = a_intersect.grow(0.2, x_coarse, z_coarse)
+        self.assertIsInstance(grown, regions.MaskRegion)
+
+        for x_axis, z_axis in [(self.x_axis, self.z_axis),
+                (np.linspace(-11, 11, 203), np.linspace(-1, 21, 203))]:
+            mask_actual = grown.create_mask(x_axis, z_axis)
+            self.assertTrue(np.any(mask_actual))
+            for tile_size, min_tile_size in [(32, 8), (16, 1)]:
+                mask = raster.rasterize(grown, x_axis, z_axis, tile_size,
+                    min_tile_size)
+                self.assertTrue(np.array_equal(mask, mask_actual))
+
+        # boxes reaching half a pixel past the pixel centres are inside
+        x_grown, z_grown = grown.x_axis, grown.z_axis
+        row = np.argmax(grown.mask.sum(axis=1))
+        ix = np.nonzero(np.all(grown.mask[row - 1:row + 2], axis=0))[0]
+        self.assertTrue(np.all(np.diff(ix) == 1))
+        x_min = x_grown[ix[0]] - 0.24
+        x_max = x_grown[ix[-1]] + 0.24
+        self.assertTrue(grown.contains_box(x_min, x_max,
+            z_grown[row - 1] - 0.24, z_grown[row + 1] + 0.24))
+        self.assertFalse(grown.contains_box(x_min - 0.02, x_max,
+            z_grown[row - 1], z_grown[row + 1]))
+
+    def test_rasterize_tiles(self):
+        """Test only boundary tiles are evaluated pixel by pixel"""
+        a_circle = regions.Circle(0, 10, 8, 'mm')
+        tiles = raster.rasterize_tiles(a_circle, self.x_axis, self.z_axis,
+            tile_size=32, min_tile_size=4)
+        mask = a_circle.create_mask(self.x_axis, self.z_axis)
+        self.assertEqual(tiles.count(), mask.sum())
+        self.assertGreater(tiles.stats['inside'], 0)
+        self.assertGreater(tiles.stats['outside'], 0)
+        self.assertEqual(tiles.stats['boundary'], len(tiles.boundary))
+        self.assertLess(tiles.stats['pixels_evaluated'], mask.size / 2)
+
+        # the grid points of inside tiles are all inside the region
+        for z0, z1, x0, x1 in tiles.inside:
+            self.assertTrue(np.all(mask[z0:z1, x0:x1]))
+
+    def test_SummedAreaTable(self):
+        """Test region sums from interior tiles and boundary pixels"""
+        rng = np.random.default_rng(5)
+        frames = rng.normal(2, 1, (3, len(self.z_axis), len(self.x_axis)))
+        table = raster.SummedAreaTable(frames)
+        self.assertTrue(np.allclose(table.block_sum(10, 20, 5, 9),
+            frames[:, 10:20, 5:9].sum(axis=(1, 2))))
+
+        for region in self.region_list:
+            tiles = raster.rasterize_tiles(region, self.x_axis, self.z_axis)
+            total, total_sq, n = table.region_sums(tiles)
+            values = frames[:, region.create_mask(self.x_axis, self.z_axis)]
+            self.assertEqual(n, values.shape[1])
+            self.assertTrue(np.allclose(total, values.sum(axis=1)))
+            self.assertTrue(np.allclose(total_sq, (values ** 2).sum(axis=1)))
+
+        with self.assertRaises(ValueError):
+            table.region_sums(raster.rasterize_tiles(self.region_list[0],
+                self.x_axis[:10], self.z_axis))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -2,6 +2,7 @@
 
 import unittest
 import regions
+import raster
 import numpy as np
 
 class TestCode(unittest.TestCase):
@@ -340,6 +341,338 @@ class TestCode(unittest.TestCase):
         self.assertTrue(np.allclose(region_values, region_values_actual))
 
 
+    def test_bounding_box(self):
+        """Test bounding boxes of regions"""
+        a_square = regions.Square(0.5, 0.5, 1, 'mm')
+        a_circle = regions.Circle(1, 1, 1, 'mm')
+        a_polygon = regions.Polygon('test_vertices.txt', 'mm')
+        self.assertTrue(np.allclose(a_square.bounding_box(), [0, 1, 0, 1]))
+        self.assertTrue(np.allclose(a_circle.bounding_box(), [0, 2, 0, 2]))
+        self.assertTrue(np.allclose(regions.Annulus(1, 2, 0.5, 1,
+            'mm').bounding_box(), [0, 2, 1, 3]))
+        self.assertTrue(np.allclose(a_polygon.bounding_box(),
+            [0.4, 1.6, 0.4, 1.6]))
+        self.assertTrue(np.allclose(regions.RegionUnion([a_square,
+            a_circle]).bounding_box(), [0, 2, 0, 2]))
+        self.assertTrue(np.allclose(regions.RegionIntersect([a_square,
+            a_polygon]).bounding_box(), [0.4, 1, 0.4, 1]))
+
+    def test_contains_points(self):
+        """Test point containment matches the masks"""
+        x_axis = np.linspace(0, 2, 9)
+        z_axis = np.linspace(0, 2, 9)
+        x_grid, z_grid = np.meshgrid( x_axis, z_axis )
+        a_square = regions.Square(0.5, 0.5, 1, 'mm')
+        a_circle = regions.Circle(1, 1, 1, 'mm')
+        region_list = [a_square, a_circle,
+            regions.Ellipse(1, 1, 0.5, 1, 'mm'),
+            regions.Annulus(1, 1, 0.3, 0.8, 'mm'),
+            regions.Polygon('test_vertices.txt', 'mm'),
+            regions.RegionUnion([a_square, a_circle]),
+            regions.RegionIntersect([a_square, a_circle])]
+        for region in region_list:
+            self.assertTrue(np.array_equal(
+                region.contains_points(x_grid, z_grid),
+                region.create_mask(x_axis, z_axis)))
+
+    def test_intersects_box(self):
+        """Test box intersection of shapes"""
+        a_circle = regions.Circle(0, 0, 1, 'mm')
+        self.assertTrue(a_circle.intersects_box(0.5, 2, 0.5, 2))
+        self.assertFalse(a_circle.intersects_box(0.8, 2, 0.8, 2))
+
+        a_ellipse = regions.Ellipse(0, 0, 2, 1, 'mm')
+        self.assertTrue(a_ellipse.intersects_box(1.5, 3, 0.5, 3))
+        self.assertFalse(a_ellipse.intersects_box(1.5, 3, 0.8, 3))
+
+        # box inside the hole of an annulus
+        a_annulus = regions.Annulus(0, 0, 1, 2, 'mm')
+        self.assertFalse(a_annulus.intersects_box(-0.5, 0.5, -0.5, 0.5))
+        self.assertTrue(a_annulus.intersects_box(-0.5, 1.5, -0.5, 0.5))
+
+        # triangle with a box beyond its hypotenuse, crossing an edge and
+        # inside it
+        a_polygon = regions.Polygon([[0, 0], [2, 0], [0, 2]], 'mm')
+        self.assertFalse(a_polygon.intersects_box(1.5, 2, 1.5, 2))
+        self.assertTrue(a_polygon.intersects_box(0.9, 2, 0.9, 2))
+        self.assertTrue(a_polygon.intersects_box(0.2, 0.3, 0.2, 0.3))
+        self.assertTrue(a_polygon.intersects_box(-1, 3, -1, 3))
+
+    def test_contains_box(self):
+        """Test box containment of shapes"""
+        a_circle = regions.Circle(0, 0, 1, 'mm')
+        self.assertTrue(a_circle.contains_box(-0.7, 0.7, -0.7, 0.7))
+        self.assertFalse(a_circle.contains_box(-0.8, 0.8, -0.8, 0.8))
+
+        a_annulus = regions.Annulus(0, 0, 1, 2, 'mm')
+        self.assertTrue(a_annulus.contains_box(1.1, 1.3, -0.2, 0.2))
+        self.assertFalse(a_annulus.contains_box(0.5, 1.3, -0.2, 0.2))
+
+        a_polygon = regions.Polygon([[0, 0], [2, 0], [0, 2]], 'mm')
+        self.assertTrue(a_polygon.contains_box(0.2, 0.8, 0.2, 0.8))
+        self.assertFalse(a_polygon.contains_box(0.2, 1.2, 0.2, 1.2))
+
+        a_square = regions.Square(0, 0, 2, 'mm')
+        self.assertTrue(regions.RegionIntersect([a_square,
+            a_circle]).contains_box(-0.5, 0.5, -0.5, 0.5))
+        self.assertFalse(regions.RegionIntersect([a_square,
+            a_circle]).contains_box(-0.9, 0.9, -0.9, 0.9))
+        self.assertTrue(regions.RegionUnion([a_square,
+            a_circle]).contains_box(-0.9, 0.9, -0.9, 0.9))
+
+    def _dilate_brute_force(self, mask, x_axis, z_axis, distance):
+        """Dilate a mask by comparing the distance of every pair of pixels"""
+        x_grid, z_grid = np.meshgrid( x_axis, z_axis )
+        points = np.column_stack([x_grid.ravel(), z_grid.ravel()])
+        inside = points[mask.ravel()]
+        dist = np.sqrt(np.sum((points[:, np.newaxis, :]
+            - inside[np.newaxis, :, :]) ** 2, axis=2))
+        dilated = np.any(dist <= distance + 1e-9, axis=1)
+        return np.reshape(dilated, mask.shape)
+
+    def test_grow_shapes(self):
+        """Test analytic growing and shrinking of shapes"""
+        x_axis = np.linspace(-3, 3, 61)
+        z_axis = np.linspace(-3, 3, 61)
+        x_grid, z_grid = np.meshgrid( x_axis, z_axis )
+
+        a_circle = regions.Circle(0, 0, 1, 'mm').grow(0.5)
+        self.assertIsInstance(a_circle, regions.Circle)
+        self.assertEqual(a_circle.radius, 1.5)
+        self.assertEqual(regions.Circle(0, 0, 1, 'mm').shrink(0.25).radius,
+            0.75)
+        with self.assertRaises(ValueError):
+            regions.Circle(0, 0, 1, 'mm').shrink(1)
+
+        a_ellipse = regions.Ellipse(0, 0, 1, 2, 'mm').grow(0.5)
+        self.assertEqual((a_ellipse.radius_x, a_ellipse.radius_z), (1.5, 2.5))
+
+        # growing a rectangle rounds the corners
+        a_rectangle = regions.Rectangle(0, 0, 2, 1, 'mm')
+        mask = a_rectangle.grow(0.75).create_mask(x_axis, z_axis)
+        dist = np.sqrt(np.maximum(np.abs(x_grid) - 1, 0) ** 2
+            + np.maximum(np.abs(z_grid) - 0.5, 0) ** 2)
+        self.assertTrue(np.array_equal(mask, dist <= 0.75))
+        a_shrunk = a_rectangle.shrink(0.25)
+        self.assertEqual((a_shrunk.width, a_shrunk.height), (1.5, 0.5))
+
+        a_annulus = regions.Annulus(0, 0, 1, 2, 'mm')
+        self.assertEqual(a_annulus.grow(0.5).radius_in, 0.5)
+        self.assertEqual(a_annulus.grow(0.5).radius_out, 2.5)
+        self.assertEqual(a_annulus.shrink(0.25).radius_in, 1.25)
+        self.assertIsInstance(a_annulus.grow(1), regions.Circle)
+        with self.assertRaises(ValueError):
+            a_annulus.shrink(0.5)
+
+    def _edge_distance_brute_force(self, vertices, x, z):
+        """Distance of points to the closest edge of a polygon"""
+        start = np.asarray(vertices, dtype=float)
+        end = np.roll(start, -1, axis=0)
+        p = np.column_stack([x.ravel(), z.ravel()])[:, np.newaxis, :]
+        edge = end - start
+        t = np.clip(np.sum((p - start) * edge, axis=2)
+            / np.sum(edge ** 2, axis=1), 0, 1)
+        closest = start + t[:, :, np.newaxis] * edge
+        dist = np.sqrt(np.sum((p - closest) ** 2, axis=2)).min(axis=1)
+        return np.reshape(dist, x.shape)
+
+    def test_grow_Polygon(self):
+        """Test growing and shrinking polygons by their edge distance"""
+        a_polygon = regions.Polygon('test_vertices.txt', 'mm')
+        self.assertTrue(np.isclose(a_polygon.grow(0.2).area,
+            1.2 * 1.2 + 4 * 1.2 * 0.2 + np.pi * 0.2 ** 2, rtol=0.02))
+        self.assertTrue(np.isclose(a_polygon.shrink(0.2).area, 0.8 * 0.8,
+            rtol=0.02))
+        self.assertTrue(np.allclose(a_polygon.grow(0.2).bounding_box(),
+            [0.2, 1.8, 0.2, 1.8]))
+        self.assertTrue(np.allclose(a_polygon.shrink(0.2).bounding_box(),
+            [0.6, 1.4, 0.6, 1.4]))
+        self.assertEqual(a_polygon.grow(0.1).grow(0.1).distance, 0.2)
+
+        # grown polygons are drawn by the outline of their mask
+        grown = a_polygon.grow(0.2)
+        vertices = grown.create_mpl_patch().get_path().vertices
+        self.assertTrue(np.allclose([vertices[:, 0].min(),
+            vertices[:, 0].max(), vertices[:, 1].min(), vertices[:, 1].max()],
+            [0.2, 1.8, 0.2, 1.8], atol=0.01))
+        self.assertIsNone(a_polygon.shrink(0.7).create_mpl_patch())
+
+        # clockwise vertices grow outwards too
+        a_polygon = regions.Polygon(a_polygon.vertices[::-1], 'mm')
+        self.assertTrue(np.isclose(a_polygon.grow(0.2).area,
+            1.2 * 1.2 + 4 * 1.2 * 0.2 + np.pi * 0.2 ** 2, rtol=0.02))
+
+        # a spike narrower than the margin disappears when shrinking
+        a_spike = regions.Polygon([[0, 0], [10, 1.3], [10, 1.7], [0, 3]],
+            'mm')
+        shrunk = a_spike.shrink(0.3)
+        self.assertFalse(shrunk.contains_points(9.5, 1.5))
+        self.assertFalse(shrunk.contains_points(9.99, 1.5))
+        self.assertTrue(shrunk.contains_points(1, 1.5))
+
+        # a notch narrower than twice the margin is filled when growing
+        a_notch = regions.Polygon([[0, 0], [4, 0], [4, 4], [2.1, 4],
+            [2.1, 1], [1.9, 1], [1.9, 4], [0, 4]], 'mm')
+        self.assertFalse(a_notch.contains_points(2, 2))
+        self.assertTrue(a_notch.grow(0.15).contains_points(2, 2))
+
+    def test_grow_Polygon_brute_force(self):
+        """Test margins of a noisy non-convex polygon against the distance
+        of every pixel to every edge"""
+        rng = np.random.default_rng(3)
+        angle = np.linspace(0, 2 * np.pi, 800, endpoint=False)
+        radius = 3 + 0.8 * np.sin(5 * angle) + rng.uniform(-0.3, 0.3,
+            angle.size)
+        vertices = np.column_stack([radius * np.cos(angle),
+            radius * np.sin(angle)])
+        a_polygon = regions.Polygon(vertices, 'mm')
+
+        x_axis = np.linspace(-5, 5, 81)
+        z_axis = np.linspace(-5, 5, 71)
+        x_grid, z_grid = np.meshgrid( x_axis, z_axis )
+        inside = a_polygon.create_mask(x_axis, z_axis)
+        dist = self._edge_distance_brute_force(vertices, x_grid, z_grid)
+
+        for distance in [0.4, -0.3]:
+            expected = (inside | (dist <= distance) if distance > 0
+                else inside & (dist >= -distance))
+            # pixels right at the margin may go either way
+            valid = np.abs(dist - abs(distance)) > 1e-9
+
+            region = a_polygon.grow(distance)
+            mask = region.create_mask(x_axis, z_axis)
+            self.assertTrue(np.array_equal(mask[valid], expected[valid]))
+            self.assertTrue(np.array_equal(
+                region.contains_points(x_grid, z_grid)[valid],
+                expected[valid]))
+
+            # the rasterizer relies on the box tests
+            self.assertTrue(np.array_equal(raster.rasterize(region, x_axis,
+                z_axis), mask))
+
+    def test_grow_composite(self):
+        """Test growing and shrinking unions and intersections"""
+        x_axis = np.linspace(0, 2, 41)
+        z_axis = np.linspace(0, 2, 41)
+        a_square = regions.Square(0.7, 0.7, 0.8, 'mm')
+        a_circle = regions.Circle(1.2, 1.2, 0.5, 'mm')
+
+        # exact cases grow or shrink each region
+        a_union = regions.RegionUnion([a_square, a_circle]).grow(0.1)
+        self.assertIsInstance(a_union, regions.RegionUnion)
+        a_intersect = regions.RegionIntersect([a_square, a_circle]).shrink(0.1)
+        self.assertIsInstance(a_intersect, regions.RegionIntersect)
+
+        with self.assertRaises(ValueError):
+            regions.RegionUnion([a_square, a_circle]).shrink(0.1)
+
+        # the other cases are computed on the grid
+        a_intersect = regions.RegionIntersect([a_square, a_circle])
+        mask = a_intersect.create_mask(x_axis, z_axis)
+        grown = a_intersect.grow(0.2, x_axis, z_axis)
+        self.assertIsInstance(grown, regions.MaskRegion)
+        self.assertTrue(np.array_equal(grown.create_mask(x_axis, z_axis),
+            self._dilate_brute_force(mask, x_axis, z_axis, 0.2)))
+
+        a_union = regions.RegionUnion([a_square, a_circle])
+        mask = a_union.create_mask(x_axis, z_axis)
+        shrunk = a_union.shrink(0.15, x_axis, z_axis)
+        self.assertTrue(np.array_equal(shrunk.create_mask(x_axis, z_axis),
+            ~self._dilate_brute_force(~mask, x_axis, z_axis, 0.15)))
+
+        # decreasing axes give the same region
+        grown_flipped = a_intersect.grow(0.2, x_axis[::-1], z_axis[::-1])
+        self.assertTrue(np.array_equal(
+            grown_flipped.create_mask(x_axis[::-1], z_axis),
+            grown.create_mask(x_axis[::-1], z_axis)))
+        self.assertTrue(np.any(grown_flipped.create_mask(x_axis, z_axis)))
+
+        # the grown mask can be grown again without a grid
+        grown_twice = grown.grow(0.1)
+        self.assertTrue(np.array_equal(grown_twice.create_mask(x_axis, z_axis),
+            self._dilate_brute_force(grown.create_mask(x_axis, z_axis),
+                x_axis, z_axis, 0.1)))
+
+    def test_crop_to_regions(self):
+        """Test the crop contains all region pixels"""
+        x_axis = np.linspace(-10, 10, 81)
+        z_axis = np.linspace(0, 30, 121)
+        a_circle = regions.Circle(0, 15, 3, 'mm')
+        a_annulus = regions.Annulus(0, 15, 4, 6, 'mm')
+        z_slice, x_slice = regions.crop_to_regions([a_circle, a_annulus],
+            x_axis, z_axis)
+        mask = a_annulus.create_mask(x_axis, z_axis)
+        cropped = np.zeros(mask.shape, dtype=bool)
+        cropped[z_slice, x_slice] = True
+        self.assertTrue(np.all(cropped[mask]))
+        self.assertLess(cropped.sum(), mask.size)
+
+    def test_MaskRegion(self):
+        """Test regions defined by a mask"""
+        x_axis = np.linspace(0, 2, 5)
+        z_axis = np.linspace(0, 2, 5)
+        mask = regions.Circle(1, 1, 0.5, 'mm').create_mask(x_axis, z_axis)
+        a_mask_region = regions.MaskRegion(mask, x_axis, z_axis, 'mm')
+        self.assertTrue(np.array_equal(
+            a_mask_region.create_mask(x_axis, z_axis), mask))
+        self.assertTrue(np.allclose(a_mask_region.area, 5 * 0.5 * 0.5))
+        self.assertTrue(np.allclose(a_mask_region.bounding_box(),
+            [0.25, 1.75, 0.25, 1.75]))
+        self.assertTrue(a_mask_region.contains_points(1.1, 0.9))
+        self.assertFalse(a_mask_region.contains_points(5, 1))
+        with self.assertRaises(ValueError):
+            regions.MaskRegion(mask[:, ::-1], x_axis[::-1], z_axis, 'mm')
+
+        # the patch follows the edges of the mask pixels
+        vertices = a_mask_region.create_mpl_patch().get_path().vertices
+        self.assertTrue(np.allclose([vertices[:, 0].min(),
+            vertices[:, 0].max(), vertices[:, 1].min(), vertices[:, 1].max()],
+            a_mask_region.bounding_box()))
+
+        # pixels extend half a sample around their centres
+        self.assertTrue(a_mask_region.contains_points(1.7, 1.0))
+        self.assertTrue(a_mask_region.intersects_box(1.65, 1.8, 0.9, 1.1))
+        self.assertTrue(a_mask_region.contains_box(1.3, 1.7, 0.9, 1.1))
+        self.assertFalse(a_mask_region.contains_box(1.3, 1.8, 0.9, 1.1))
+
+        # values on a larger, finer grid come from the nearest pixel
+        x_fine = np.linspace(-1, 3, 17)
+        mask_fine = a_mask_region.create_mask(x_fine, x_fine)
+        self.assertEqual(mask_fine.shape, (17, 17))
+        self.assertFalse(np.any(mask_fine[:, x_fine < 0]))
+        x_fine = np.linspace(-0.5, 2.5, 61)
+        self.assertTrue(np.array_equal(raster.rasterize(a_mask_region,
+            x_fine, x_fine), a_mask_region.create_mask(x_fine, x_fine)))
+
+    def test_Profiler(self):
+        """Test Profiler records stages per region type"""
+        a_square = regions.Square(0.5, 0.5, 1, 'mm')
+        a_circle = regions.Circle(1, 1, 1, 'mm')
+        a_region_union = regions.RegionUnion([a_square, a_circle])
+
+        x_axis = np.linspace(0, 2, 5)
+        z_axis = np.linspace(0, 2, 5)
+        img = np.ones((5, 5))
+
+        with regions.Profiler() as prof:
+            a_region_union.get_values_in_region(img, x_axis, z_axis)
+        stats = prof.as_dict()
+
+        self.assertEqual(stats['Square']['meshgrid']['calls'], 1)
+        self.assertEqual(stats['Square']['meshgrid']['pixels'], 25)
+        self.assertEqual(stats['Circle']['evaluate']['calls'], 1)
+        self.assertEqual(stats['RegionUnion']['combine']['pixels'], 50)
+        self.assertEqual(stats['RegionUnion']['indexing']['bytes'],
+            16 * img.itemsize)
+        self.assertTrue(stats['Circle']['evaluate']['time'] >= 0)
+        self.assertIn('"RegionUnion"', prof.to_json())
+
+        # nothing is recorded once the profiler has exited
+        a_square.create_mask(x_axis, z_axis)
+        self.assertEqual(prof.as_dict(), stats)
+        self.assertIsNone(regions._active_profiler)
+
+
 
 if __name__ == '__main__':
     print("Running unit tests for stft.py")
@@ -0,0 +1,105 @@
+#!/usr/bin/env python
+
+import unittest
+
+import numpy as np
+
+import regions
+from spatial_index import RegionIndex
+
+
+class TestCode(unittest.TestCase):
+
+    def setUp(self):
+        rng = np.random.default_rng(3)
+        self.region_list = []
+        for xc, zc, kind in zip(rng.uniform(0, 100, 300),
+                rng.uniform(0, 100, 300), rng.integers(0, 4, 300)):
+            if kind == 0:
+                region = regions.Circle(xc, zc, 2, 'mm')
+            elif kind == 1:
+                region = regions.Rectangle(xc, zc, 3, 1.5, 'mm')
+            elif kind == 2:
+                region = regions.Annulus(xc, zc, 1, 3, 'mm')
+            else:
+                region = regions.Polygon(np.asarray([[0, 0], [4, 0], [0, 3]])
+                    + [xc, zc], 'mm')
+            self.region_list.append(region)
+
+        self.index = RegionIndex(cell_size=5)
+        for region in self.region_list:
+            self.index.insert(region)
+
+    def test_query_point(self):
+        """Test point queries match testing every region"""
+        rng = np.random.default_rng(4)
+        for x, z in rng.uniform(0, 100, (200, 2)):
+            expected = [key for key, region in enumerate(self.region_list)
+                if region.contains_points(x, z)]
+            self.assertEqual(self.index.query_point(x, z), expected)
+
+    def test_query_point_MaskRegion(self):
+        """Test point queries near the edge of a mask pixel"""
+        x_axis = np.linspace(0, 2, 5)
+        z_axis = np.linspace(0, 2, 5)
+        mask = regions.Circle(1, 1, 0.5, 'mm').create_mask(x_axis, z_axis)
+        index = RegionIndex(cell_size=0.5)
+        index.insert(regions.MaskRegion(mask, x_axis, z_axis, 'mm'))
+        self.assertEqual(index.query_point(1.7, 1.0), [0])
+        self.assertEqual(index.query_point(1.8, 1.0), [])
+
+    def test_query_window(self):
+        """Test window queries match rasterized regions"""
+        x_axis = np.linspace(20, 30, 201)
+        z_axis = np.linspace(40, 45, 101)
+        found = self.index.query_window(20, 30, 40, 45)
+        expected = [key for key, region in enumerate(self.region_list)
+            if np.any(region.create_mask(x_axis, z_axis))]
+        self.assertEqual(found, expected)
+
+    def test_query_region(self):
+        """Test region overlap queries"""
+        x_axis = np.linspace(0, 100, 401)
+        z_axis = np.linspace(0, 100, 401)
+        query = regions.Circle(50, 50, 10, 'mm')
+        query_mask = query.create_mask(x_axis, z_axis)
+
+        found = self.index.query_region(query, x_axis, z_axis)
+        expected = [key for key, region in enumerate(self.region_list)
+            if np.any(query_mask & region.create_mask(x_axis, z_axis))]
+        self.assertEqual(found, expected)
+
+        # without a grid the result may only include extra candidates
+        self.assertTrue(set(found) <= set(self.index.query_region(query)))
+
+    def test_insert_remove(self):
+        """Test incremental updates of the index"""
+        index = RegionIndex(cell_size=1, max_cells=16)
+        small = index.insert(regions.Circle(0, 0, 0.5, 'mm'))
+        large = index.insert(regions.Circle(0, 0, 50, 'mm'), key='large')
+        whole = index.insert(regions.Region())
+        self.assertEqual(len(index), 3)
+        self.assertEqual(index.query_point(0, 0), [small, 'large', whole])
+        self.assertEqual(index.query_point(10, 10), ['large', whole])
+
+        index.remove('large')
+        self.assertNotIn('large', index)
+        self.assertEqual(index.query_point(10, 10), [whole])
+
+        index.update(small, regions.Circle(10, 10, 0.5, 'mm'))
+        self.assertEqual(index.query_point(10, 10), [small, whole])
+        self.assertEqual(index.query_point(0, 0), [whole])
+        with self.assertRaises(KeyError):
+            index.insert(regions.Circle(0, 0, 1, 'mm'), key=small)
+
+        # an invalid update leaves the index unchanged
+        with self.assertRaises(ValueError):
+            index.update(small, 'not a region')
+        with self.assertRaises(KeyError):
+            index.update('missing', regions.Circle(0, 0, 1, 'mm'))
+        self.assertEqual(len(index), 2)
+        self.assertEqual(index.query_point(10, 10), [small, whole])
+
+
+if __name__ == '__main__':
+    unittest.main()